@@ -0,0 +1,70 @@
+"""
+Endpoint benchmarks, skipped unless ``BENCHMARK=1``:
+
+    BENCHMARK=1 BENCHMARK_SCALE=100k BENCHMARK_OUTPUT=results.json \
+        python manage.py test benchmarks
+
+Run against the test database of the configured backend, SQLite or Postgres.
+Every endpoint must answer without errors and within its query budget
+(``QUERY_BUDGETS``), the timings are written to ``BENCHMARK_OUTPUT``.
+"""
+import os
+from unittest import skipUnless
+
+from django.test import TestCase
+
+from core import benchmark, seeding
+from core.querybudget import get_budget
+
+SCALE = os.environ.get("BENCHMARK_SCALE", "10k")
+REQUESTS = int(os.environ.get("BENCHMARK_REQUESTS", 100))
+
+
+@skipUnless(os.environ.get("BENCHMARK") == "1", "Set BENCHMARK=1 to run benchmarks")
+class EndpointBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = {}
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(seeding.SCALES[SCALE])
+        cls.environment = benchmark.get_environment()
+
+    @classmethod
+    def tearDownClass(cls):
+        output = os.environ.get("BENCHMARK_OUTPUT")
+        if output and cls.results:
+            benchmark.save({**cls.environment, "endpoints": cls.results}, output)
+        super().tearDownClass()
+
+    def measure(self, name: str):
+        metrics = benchmark.run([name], requests=REQUESTS)["endpoints"][name]
+        self.results[name] = metrics
+        self.assertEqual(metrics["errors"], 0)
+        self.assertLessEqual(metrics["queries"], get_budget(metrics["endpoint"]))
+
+    def test_list(self):
+        self.measure("list")
+
+    def test_detail(self):
+        self.measure("detail")
+
+    def test_search(self):
+        self.measure("search")
+
+    def test_like(self):
+        self.measure("like")
+
+    def test_unlike(self):
+        self.measure("unlike")
+
+    def test_login(self):
+        self.measure("login")
+
+    def test_signup(self):
+        self.measure("signup")
+
+    def test_me(self):
+        self.measure("me")
@@ -0,0 +1,58 @@
+"""
+Helpers for the async read endpoints under ``api/async/``.
+
+DRF views are synchronous, so these endpoints are plain Django async views.
+``async_api_view`` gives them the parts of DRF they rely on: JWT
+authentication, ``request.user``/``request.auth`` and DRF-style error
+responses.
+"""
+from functools import wraps
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from rest_framework import exceptions
+
+from core.authentication import CachedJWTAuthentication
+
+authentication = CachedJWTAuthentication()
+
+
+def json_response(data, status: int = 200, **kwargs) -> JsonResponse:
+    return JsonResponse(
+        data, status=status, encoder=DjangoJSONEncoder, safe=False, **kwargs
+    )
+
+
+def error_response(request, exc: exceptions.APIException) -> JsonResponse:
+    data = exc.detail
+    if not isinstance(data, (list, dict)):
+        data = {"detail": data}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response["WWW-Authenticate"] = authentication.authenticate_header(request)
+    return response
+
+
+def async_api_view(authenticated: bool = False):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return error_response(
+                    request, exceptions.MethodNotAllowed(request.method)
+                )
+            try:
+                result = await authentication.aauthenticate(request)
+                request.user, request.auth = result or (AnonymousUser(), None)
+                if authenticated and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                return await view(request, *args, **kwargs)
+            except Http404:
+                return error_response(request, exceptions.NotFound())
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+
+        return wrapper
+
+    return decorator
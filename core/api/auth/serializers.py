@@ -1,5 +1,6 @@
 from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import serializers
 
 from core.models import User
@@ -35,9 +36,13 @@ class SignupSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
+            ip_address = validated_data.pop("signup_ip_address", None)
             user = User.objects.create_user(
                 email=validated_data.pop("email"),
                 password=validated_data.pop("password"),
+                signup_ip_address=ip_address,
+                # Picked up by the next enrich_pending_users run
+                enrichment_retry_at=timezone.now() if ip_address else None,
             )
         except IntegrityError:
             raise serializers.ValidationError({"email": "Email Address already used"})
@@ -8,7 +8,7 @@ from .serializers import (
     SignupSerializer,
 )
 from ..user.serializers import UserPrivateSerializer
-from ...tasks import save_user_meta_data
+from ...tasks import schedule_enrichment
 
 
 class AuthViewSet(viewsets.GenericViewSet):
@@ -37,11 +37,11 @@ class AuthViewSet(viewsets.GenericViewSet):
     def signup(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        user = serializer.save(
+            signup_ip_address=request.META.get("REMOTE_ADDR") or None
+        )
         refresh_token, access_token = get_refresh_and_access_tokens(user=user)
-
-        ip_address = request.META.get("REMOTE_ADDR", "")
-        save_user_meta_data.delay(ip_address, user.email)
+        schedule_enrichment()
 
         return response.Response(
             UserPrivateSerializer(user).data,
@@ -0,0 +1,55 @@
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    content = json.dumps(
+        parts, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder
+    )
+    return '"%s"' % hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def latest(*values):
+    """Most recent of datetimes or ISO 8601 strings, ignoring empty values."""
+    parsed = [
+        parse_datetime(value) if isinstance(value, str) else value
+        for value in values
+        if value
+    ]
+    return max((value for value in parsed if isinstance(value, datetime)), default=None)
+
+
+def set_validators(response, etag: str, last_modified: datetime = None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Payloads carry per-viewer fields such as liked_by_me
+    patch_vary_headers(response, ("Authorization",))
+    return response
+
+
+def conditional_response(request, response, etag: str, last_modified=None):
+    """
+    Attach ``ETag``/``Last-Modified`` to ``response`` and swap it for a 304
+    when the request's ``If-None-Match``/``If-Modified-Since`` still match.
+    """
+    set_validators(response, etag, last_modified)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(
+        request, etag=etag, last_modified=timestamp, response=response
+    )
+
+
+def not_modified_response(request, etag: str, last_modified=None):
+    """Like ``conditional_response`` but returns None when a body is needed."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
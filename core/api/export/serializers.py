@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from core.exporter import EXPORTS
+
+
+class ExportSerializer(serializers.Serializer):
+    models = serializers.MultipleChoiceField(choices=list(EXPORTS), required=False)
+    since = serializers.DateTimeField(required=False)
+
+    def validate_models(self, value):
+        # Keep the dependency order of EXPORTS, users before their posts
+        return [name for name in EXPORTS if name in value]
@@ -0,0 +1,29 @@
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import viewsets
+from rest_framework.permissions import IsAdminUser
+
+from .serializers import ExportSerializer
+from ...exporter import Exporter
+
+
+class ExportViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        serializer = ExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        compress = "gzip" in request.headers.get("Accept-Encoding", "")
+        exporter = Exporter(
+            models=serializer.validated_data.get("models"),
+            since=serializer.validated_data.get("since"),
+            compress=compress,
+        )
+        response = StreamingHttpResponse(
+            exporter.chunks(), content_type="application/x-ndjson"
+        )
+        if compress:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
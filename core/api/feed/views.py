@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import mixins, viewsets
+from rest_framework.permissions import IsAuthenticated
+
+from core.models import Follow, Post
+from core.timeline import get_timeline_store
+from ..pagination import PostPagination
+from ..posts.serializers import PostPublicSerializer
+
+
+class FeedViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    permission_classes = [IsAuthenticated]
+    pagination_class = PostPagination
+    serializer_class = PostPublicSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        timeline = get_timeline_store().get(user.pk)
+        # Posts of very popular authors are not fanned out on write
+        popular_followees = Follow.objects.filter(
+            follower_id=user.pk,
+            followee__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values("followee")
+
+        return (
+            Post.objects.filter(
+                Q(pk__in=timeline)
+                | Q(author_id=user.pk)
+                | Q(author__in=popular_followees)
+            )
+            .select_related("author")
+            .defer("search_vector")
+            .with_liked_by_me(user)
+        )
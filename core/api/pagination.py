@@ -0,0 +1,183 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination over a compound, unique ordering.
+
+    Unlike DRF's ``CursorPagination`` the cursor stores the full ordering key
+    of the boundary row, so every page is fetched with a single
+    ``WHERE (a, b) < (x, y) ORDER BY a, b LIMIT n`` query, no matter how deep
+    the client scrolls, and rows inserted meanwhile never shift a page.
+    """
+
+    ordering = None
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([instance async for instance in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """The requested page plus one row, telling whether another page follows."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip("-")) for name in self.ordering
+        ]
+        self.page_size = self.get_page_size(request)
+
+        self.reverse, self.position = self.decode_cursor(request)
+        ordering = self.ordering if not self.reverse else self.reversed_ordering()
+
+        if self.position is not None:
+            queryset = queryset.filter(self.position_filter(ordering, self.position))
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_following = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def reversed_ordering(self):
+        return tuple(
+            name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering
+        )
+
+    def position_filter(self, ordering, position):
+        # Lexicographic "row comes after position" written as
+        # (a > x) OR (a = x AND b > y) OR ... so it works on every backend.
+        condition = Q()
+        for index, name in enumerate(ordering):
+            lookup = "lt" if name.startswith("-") else "gt"
+            clause = Q(**{f"{name.lstrip('-')}__{lookup}": position[index]})
+            for previous in range(index):
+                clause &= Q(**{self.fields[previous].name: position[previous]})
+            condition |= clause
+        return condition
+
+    def get_position(self, instance):
+        return [field.value_to_string(instance) for field in self.fields]
+
+    def encode_cursor(self, reverse, position):
+        data = {"p": position}
+        if reverse:
+            data["r"] = 1
+        token = urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+
+        try:
+            data = json.loads(urlsafe_b64decode(token.encode("ascii")))
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, data["p"])
+            ]
+            reverse = bool(data.get("r"))
+        except (
+            BinasciiError,
+            UnicodeError,
+            ValueError,
+            TypeError,
+            KeyError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(position) != len(self.fields) or None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class PostPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class LikePagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .filters import PostFilter
+from .serializers import PostPublicSerializer
+from ..asynchronous import async_api_view, json_response
+from ..conditional import conditional_response, make_etag
+from ..pagination import PostPagination
+from ...models import Post
+
+
+def get_queryset(request):
+    return (
+        Post.objects.select_related("author")
+        .defer("search_vector")
+        .with_liked_by_me(request.user)
+    )
+
+
+@async_api_view()
+async def post_list(request):
+    queryset = get_queryset(request)
+    if any(name in request.GET for name in PostFilter.base_filters):
+        filterset = PostFilter(request.GET, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        # The in-memory search backend syncs its index with a query
+        queryset = await sync_to_async(lambda: filterset.qs)()
+
+    paginator = PostPagination()
+    posts = await paginator.apaginate_queryset(queryset, Request(request))
+    data = OrderedDict(
+        [
+            ("next", paginator.get_next_link()),
+            ("previous", paginator.get_previous_link()),
+            ("results", PostPublicSerializer(posts, many=True).data),
+        ]
+    )
+    # ETag only, as PostViewSet.list
+    return conditional_response(request, json_response(data), etag=make_etag(data))
+
+
+@async_api_view()
+async def post_detail(request, pk: int):
+    try:
+        post = await get_queryset(request).aget(pk=pk)
+    except Post.DoesNotExist:
+        raise Http404
+    data = PostPublicSerializer(post).data
+    return conditional_response(request, json_response(data), etag=make_etag(data))
@@ -1,18 +1,19 @@
 import django_filters
-from django.db.models import Q
-from django_filters import CharFilter
+from django_filters import CharFilter, IsoDateTimeFilter
 
 from core.models import Post
+from core.search import get_post_search_backend
 
 
 class PostFilter(django_filters.FilterSet):
     q = CharFilter(method="search")
-    author = django_filters.NumberFilter(field_name="id")
+    author = django_filters.NumberFilter(field_name="author")
+    created_after = IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
 
     class Meta:
         model = Post
-        fields = ("author",)
+        fields = ("author", "created_after", "created_before")
 
     def search(self, queryset, _, value):
-        query = Q(message__icontains=value)
-        return queryset.filter(query).distinct()
+        return get_post_search_backend().search(queryset, value)
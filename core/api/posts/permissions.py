@@ -10,6 +10,7 @@ class PostPermission(IsAuthenticated):
         )
 
     def has_permission(self, request, view):
-        safe_methods = request.method in permissions.SAFE_METHODS
+        if request.method in permissions.SAFE_METHODS:
+            return True
         is_authenticated = super().has_permission(request, view)
-        return safe_methods or (is_authenticated and hasattr(request.user, "author"))
+        return is_authenticated and hasattr(request.user, "author")
@@ -1,24 +1,27 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
 from core.api.user.serializers import UserPublicSerializer, UserPrivateSerializer
-from core.models import Post
-from core.utils import generate_post_slug
+from core.models import Like, Post
+from core.utils import create_post
 
 
 class PostPrivateSerializer(serializers.ModelSerializer):
-    likes = UserPublicSerializer(read_only=True, many=True)
     author = UserPrivateSerializer(required=False)
+    liked_by_me = serializers.BooleanField(read_only=True, default=False)
 
     class Meta:
         model = Post
-        fields = "__all__"
+        exclude = ("likes", "search_vector")
         read_only_fields = (
             "created_at",
             "updated_at",
             "author",
             "deleted_at",
             "is_deleted",
-            "likes",
+            "like_count",
+            "slug",
         )
         extra_kwargs = {
             "message": {"required": True},
@@ -31,9 +34,7 @@ class PostPrivateSerializer(serializers.ModelSerializer):
         return validated_data
 
     def create(self, validated_data):
-        post = Post.objects.create(**validated_data)
-        generate_post_slug(post)
-        return post
+        return create_post(**validated_data)
 
 
 class LikePostPublicSerializer(serializers.Serializer):
@@ -47,9 +48,9 @@ class LikePostPublicSerializer(serializers.Serializer):
 
     def save(self):
         post: Post = self.validated_data["id"]
-        likes = set(post.likes.all())
-        likes.add(self.validated_data["user"])
-        post.likes.set(likes)
+        if Like.objects.like(post, self.validated_data["user"]):
+            post.refresh_from_db(fields=["like_count"])
+        post.liked_by_me = True
         return post
 
 
@@ -64,15 +65,79 @@ class UnlikePostPublicSerializer(serializers.Serializer):
 
     def save(self):
         post: Post = self.validated_data["id"]
-        likes = set(post.likes.all())
-        likes.remove(self.validated_data["user"])
-        post.likes.set(likes)
+        if Like.objects.unlike(post, self.validated_data["user"]):
+            post.refresh_from_db(fields=["like_count"])
+        post.liked_by_me = False
         return post
 
 
+class BatchLikePostSerializer(serializers.Serializer):
+    like = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, default=list
+    )
+    unlike = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, default=list
+    )
+
+    def validate(self, data):
+        validated_data = super().validate(data)
+        like = list(dict.fromkeys(validated_data["like"]))
+        unlike = list(dict.fromkeys(validated_data["unlike"]))
+
+        if not like and not unlike:
+            raise serializers.ValidationError("Provide post ids to like or unlike")
+        if len(like) + len(unlike) > settings.POST_BATCH_LIKE_LIMIT:
+            raise serializers.ValidationError(
+                f"At most {settings.POST_BATCH_LIKE_LIMIT} post ids per request"
+            )
+        if set(like) & set(unlike):
+            raise serializers.ValidationError(
+                "A post cannot be liked and unliked in the same request"
+            )
+
+        validated_data["like"] = like
+        validated_data["unlike"] = unlike
+        validated_data["user"] = self.context["request"].user
+        return validated_data
+
+    def save(self):
+        user = self.validated_data["user"]
+        like = self.validated_data["like"]
+        unlike = self.validated_data["unlike"]
+
+        with transaction.atomic():
+            Like.objects.like_many(user, like)
+            Like.objects.unlike_many(user, unlike)
+
+        like_counts = dict(
+            Post.objects.filter(pk__in=like + unlike).values_list("pk", "like_count")
+        )
+        results = []
+        for post_ids, liked in ((like, True), (unlike, False)):
+            for post_id in post_ids:
+                if post_id in like_counts:
+                    results.append(
+                        {
+                            "id": post_id,
+                            "liked": liked,
+                            "like_count": like_counts[post_id],
+                        }
+                    )
+                else:
+                    results.append({"id": post_id, "error": "not_found"})
+        return results
+
+
+class PostImportSerializer(serializers.Serializer):
+    author = serializers.EmailField(required=True)
+    message = serializers.CharField(
+        required=True, max_length=Post._meta.get_field("message").max_length
+    )
+
+
 class PostPublicSerializer(serializers.ModelSerializer):
-    likes = UserPublicSerializer(read_only=True, many=True)
     author = UserPublicSerializer()
+    liked_by_me = serializers.BooleanField(read_only=True, default=False)
 
     class Meta:
         model = Post
@@ -81,6 +146,19 @@ class PostPublicSerializer(serializers.ModelSerializer):
             "id",
             "created_at",
             "updated_at",
-            "likes",
+            "like_count",
+            "liked_by_me",
             "message",
+            "slug",
+        )
+
+
+class PostLikeSerializer(serializers.ModelSerializer):
+    user = UserPublicSerializer()
+
+    class Meta:
+        model = Like
+        fields = (
+            "user",
+            "created_at",
         )
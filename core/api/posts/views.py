@@ -1,29 +1,131 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.http import Http404
 from rest_framework import viewsets, permissions, response, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 from .filters import PostFilter
+from ..conditional import conditional_response, make_etag
+from ..pagination import LikePagination, PostPagination
 from .permissions import PostPermission
 from .serializers import (
     PostPublicSerializer,
     PostPrivateSerializer,
     LikePostPublicSerializer,
     UnlikePostPublicSerializer,
+    BatchLikePostSerializer,
+    PostLikeSerializer,
 )
-from ...models import Post
+from ... import caching
+from ...importer import PostImporter
+from ...models import Like, Post
+from ...tasks import fan_out_post
 
 
 class PostViewSet(viewsets.ModelViewSet):
     permission_classes = [PostPermission]
     filterset_class = PostFilter
+    pagination_class = PostPagination
     serializer_class = PostPublicSerializer
-    queryset = Post.objects.filter(is_deleted=False)
+    queryset = Post.objects.select_related("author").defer("search_vector")
+
+    def get_queryset(self):
+        return super().get_queryset().with_liked_by_me(self.request.user)
 
     def get_serializer_class(self):
         if self.request.method not in permissions.SAFE_METHODS:
             return PostPrivateSerializer
         return super().get_serializer_class()
 
+    def list(self, request, *args, **kwargs):
+        url = request.build_absolute_uri()
+        page = caching.get_page(url)
+        if page is not None:
+            response = Response(
+                OrderedDict(
+                    [
+                        ("next", page["next"]),
+                        ("previous", page["previous"]),
+                        ("results", self.get_cached_posts(page["ids"])),
+                    ]
+                )
+            )
+        else:
+            posts = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            data = self.cache_posts(posts)
+            caching.set_page(
+                url,
+                [post.pk for post in posts],
+                self.paginator.get_next_link(),
+                self.paginator.get_previous_link(),
+            )
+            response = self.get_paginated_response(data)
+
+        # No Last-Modified: deletes and posts leaving the page change the list
+        # without any post's updated_at moving forward
+        return conditional_response(request, response, etag=make_etag(response.data))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs["pk"])
+        except ValueError:
+            raise Http404
+        return self.post_response(request, pk)
+
+    @action(methods=["GET"], detail=False, url_path=r"by-slug/(?P<slug>[^/]+)")
+    def by_slug(self, request, slug=None):
+        pk = Post.objects.filter(slug=slug).values_list("pk", flat=True).first()
+        if pk is None:
+            raise Http404
+        return self.post_response(request, pk)
+
+    def post_response(self, request, pk: int):
+        posts = self.get_cached_posts([pk])
+        if not posts:
+            raise Http404
+        # No Last-Modified either, updated_at misses edits of the embedded author
+        return conditional_response(
+            request, Response(posts[0]), etag=make_etag(posts[0])
+        )
+
+    def cache_posts(self, posts) -> list:
+        data = PostPublicSerializer(posts, many=True).data
+        caching.set_posts(
+            (post.author_id, {k: v for k, v in item.items() if k != "liked_by_me"})
+            for post, item in zip(posts, data)
+        )
+        return data
+
+    def get_cached_posts(self, pks) -> list:
+        posts = caching.get_posts(pks)
+        user = self.request.user
+        liked = set()
+        if posts and user.is_authenticated:
+            liked = set(
+                Like.objects.filter(
+                    user_id=user.pk, post_id__in=list(posts)
+                ).values_list("post_id", flat=True)
+            )
+        for pk in posts:
+            posts[pk]["liked_by_me"] = pk in liked
+
+        missing = [pk for pk in pks if pk not in posts]
+        if missing:
+            queryset = self.get_queryset().filter(pk__in=missing)
+            for item in self.cache_posts(list(queryset)):
+                posts[item["id"]] = item
+
+        fields = PostPublicSerializer.Meta.fields
+        return [{name: posts[pk][name] for name in fields} for pk in pks if pk in posts]
+
+    def perform_create(self, serializer):
+        post = serializer.save()
+        transaction.on_commit(lambda: fan_out_post.delay(post.pk))
+
     def destroy(self, request, *args, **kwargs):
         post = self.get_object()
         post.soft_delete()
@@ -52,3 +154,43 @@ class PostViewSet(viewsets.ModelViewSet):
         post = serializer.save()
 
         return response.Response(PostPublicSerializer(post).data)
+
+    @action(methods=["POST"], detail=False, url_path="batch-like")
+    def batch_like(self, request):
+        serializer = BatchLikePostSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return response.Response({"results": serializer.save()})
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        permission_classes=[IsAdminUser],
+    )
+    def import_posts(self, request):
+        # Read the NDJSON body line by line instead of parsing request.data
+        if request.stream is None:
+            raise ValidationError({"non_field_errors": ["Request body is empty"]})
+        return response.Response(PostImporter().run(request.stream))
+
+    @action(methods=["GET"], detail=True)
+    def likes(self, request, pk=None):
+        post = self.get_object()
+        queryset = Like.objects.filter(post=post).select_related("user")
+
+        paginator = LikePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            PostLikeSerializer(page, many=True).data
+        )
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request):
+        return response.Response(caching.get_stats())
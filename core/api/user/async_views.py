@@ -0,0 +1,21 @@
+from core.models import User
+from .serializers import UserPrivateSerializer
+from ..asynchronous import async_api_view, json_response
+from ..conditional import latest, make_etag, not_modified_response, set_validators
+
+
+@async_api_view(authenticated=True)
+async def user_me(request):
+    user = await User.objects.select_related("meta_data").aget(pk=request.user.pk)
+    meta_data = getattr(user, "meta_data", None)
+    # Same validators as UserViewSet.me, so ETags work across both endpoints
+    etag = make_etag(user.pk, user.updated_at, meta_data and meta_data.updated_at)
+    last_modified = latest(user.updated_at, meta_data and meta_data.updated_at)
+
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    return set_validators(
+        json_response(UserPrivateSerializer(user).data), etag, last_modified
+    )
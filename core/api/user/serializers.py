@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from core.models import User, UserMetaData
+from core import images
+from core.models import Follow, User, UserMetaData
 
 
 class UserMetaDataSerializer(serializers.ModelSerializer):
@@ -12,8 +14,20 @@ class UserMetaDataSerializer(serializers.ModelSerializer):
         )
 
 
+class ProfilePictureField(serializers.ReadOnlyField):
+    """URLs of the profile picture variants, never the uploaded original."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "profile_picture_variants"
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return images.variant_urls(value)
+
+
 class UserPrivateSerializer(serializers.ModelSerializer):
     meta_data = UserMetaDataSerializer()
+    profile_picture = ProfilePictureField()
 
     class Meta:
         model = User
@@ -23,14 +37,93 @@ class UserPrivateSerializer(serializers.ModelSerializer):
             "first_name",
             "last_name",
             "email_verified",
+            "profile_picture",
             "meta_data",
         )
 
 
 class UserPublicSerializer(serializers.ModelSerializer):
+    profile_picture = ProfilePictureField()
+
     class Meta:
         model = User
         fields = (
             "first_name",
             "last_name",
+            "profile_picture",
+        )
+
+
+class ProfilePictureSerializer(serializers.Serializer):
+    profile_picture = serializers.ImageField(required=True)
+
+    def validate_profile_picture(self, value):
+        if value.size > settings.PROFILE_PICTURE_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Profile pictures are limited to "
+                f"{settings.PROFILE_PICTURE_MAX_SIZE // (1024 * 1024)}MB"
+            )
+        return value
+
+    def save(self, user: User) -> User:
+        user.profile_picture = images.save_upload(
+            self.validated_data["profile_picture"]
+        )
+        # Variants of the previous picture are replaced once processed
+        user.profile_picture_variants = None
+        user.save(
+            update_fields=["profile_picture", "profile_picture_variants", "updated_at"]
+        )
+        return user
+
+
+class FollowUserSerializer(serializers.Serializer):
+    id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=True)
+
+    def validate(self, data):
+        user = self.context["request"].user
+        validated_data = super().validate(data)
+        if validated_data["id"].pk == user.pk:
+            raise serializers.ValidationError({"id": "You cannot follow yourself"})
+        validated_data["user"] = user
+        return validated_data
+
+    def save(self):
+        followee: User = self.validated_data["id"]
+        if Follow.objects.follow(self.validated_data["user"], followee):
+            followee.refresh_from_db(fields=["follower_count"])
+        followee.is_following = True
+        return followee
+
+
+class UnfollowUserSerializer(serializers.Serializer):
+    id = serializers.PrimaryKeyRelatedField(
+        queryset=User.all_objects.all(), required=True
+    )
+
+    def validate(self, data):
+        user = self.context["request"].user
+        validated_data = super().validate(data)
+        validated_data["user"] = user
+        return validated_data
+
+    def save(self):
+        followee: User = self.validated_data["id"]
+        if Follow.objects.unfollow(self.validated_data["user"], followee):
+            followee.refresh_from_db(fields=["follower_count"])
+        followee.is_following = False
+        return followee
+
+
+class UserFollowSerializer(serializers.ModelSerializer):
+    is_following = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = (
+            "id",
+            "first_name",
+            "last_name",
+            "follower_count",
+            "is_following",
         )
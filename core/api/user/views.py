@@ -1,19 +1,87 @@
+from django.db import transaction
 from rest_framework import viewsets, mixins, response, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 
-from core.models import User
+from core.models import User, UserMetaData
+from ..conditional import latest, make_etag, not_modified_response, set_validators
 from .permissions import UserPermission
-from .serializers import UserPrivateSerializer
+from .serializers import (
+    UserPrivateSerializer,
+    FollowUserSerializer,
+    ProfilePictureSerializer,
+    UnfollowUserSerializer,
+    UserFollowSerializer,
+)
+from ...tasks import backfill_timeline, process_profile_picture, remove_from_timeline
 
 
 class UserViewSet(mixins.UpdateModelMixin, viewsets.GenericViewSet):
     permission_classes = [UserPermission]
     serializer_class = UserPrivateSerializer
-    queryset = User.objects.filter(is_deleted=False)
+    queryset = User.objects.all()
 
     @action(methods=["GET"], detail=False, permission_classes=[UserPermission])
     def me(self, request):
         user = request.user
+        meta_data = UserMetaData.objects.filter(user=user).first()
+        etag = make_etag(user.pk, user.updated_at, meta_data and meta_data.updated_at)
+        last_modified = latest(user.updated_at, meta_data and meta_data.updated_at)
+
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        # Reuse the row loaded for the ETag instead of querying it again
+        user.meta_data = meta_data
+        return set_validators(
+            response.Response(
+                UserPrivateSerializer(user).data, status=status.HTTP_200_OK
+            ),
+            etag,
+            last_modified,
+        )
+
+    @action(methods=["GET"], detail=False)
+    def follow(self, request):
+        serializer = FollowUserSerializer(
+            data=request.query_params, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        followee = serializer.save()
+        transaction.on_commit(
+            lambda: backfill_timeline.delay(request.user.pk, followee.pk)
+        )
+
+        return response.Response(UserFollowSerializer(followee).data)
+
+    @action(methods=["GET"], detail=False)
+    def unfollow(self, request):
+        serializer = UnfollowUserSerializer(
+            data=request.query_params, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        followee = serializer.save()
+        transaction.on_commit(
+            lambda: remove_from_timeline.delay(request.user.pk, followee.pk)
+        )
+
+        return response.Response(UserFollowSerializer(followee).data)
+
+    @action(
+        methods=["PUT"],
+        detail=False,
+        url_path="me/profile-picture",
+        parser_classes=[MultiPartParser],
+    )
+    def profile_picture(self, request):
+        serializer = ProfilePictureSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save(User.objects.get(pk=request.user.pk))
+        transaction.on_commit(
+            lambda: process_profile_picture.delay(user.pk, user.profile_picture.name)
+        )
+
         return response.Response(
-            UserPrivateSerializer(user).data, status=status.HTTP_200_OK
+            UserPrivateSerializer(user).data, status=status.HTTP_202_ACCEPTED
         )
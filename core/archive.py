@@ -0,0 +1,137 @@
+"""
+Moves rows soft deleted for longer than ``SOFT_DELETE_RETENTION_DAYS`` out of
+the hot ``Post`` and ``User`` tables into ``ArchivedPost`` and
+``ArchivedUser``.
+
+Rows are moved in small batches, each in its own transaction and followed by
+a pause, so a purge never holds locks for long or competes with traffic for
+the database. Every run stops after ``PURGE_MAX_BATCHES`` batches per model,
+the next scheduled run carries on.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core import caching
+from core.models import ArchivedPost, ArchivedUser, Follow, Like, Post, User
+
+POST_FIELDS = (
+    "id",
+    "author_id",
+    "message",
+    "slug",
+    "like_count",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+)
+USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+)
+
+
+def archive_posts(post_ids) -> int:
+    """Copy ``post_ids`` into ``ArchivedPost`` and delete them with their likes."""
+    posts = Post.all_objects.filter(pk__in=post_ids)
+    ArchivedPost.objects.bulk_create(
+        [ArchivedPost(**row) for row in posts.values(*POST_FIELDS)]
+    )
+    posts.delete()
+    return len(post_ids)
+
+
+def archive_users(user_ids) -> int:
+    """
+    Copy ``user_ids`` into ``ArchivedUser`` and delete them. All their posts
+    are archived with them, and the like and follower counts of what they
+    liked and followed are decremented.
+    """
+    user_ids = list(user_ids)
+    now = timezone.now()
+
+    # Posts whose like_count drops by the same amount share one update
+    liked = defaultdict(list)
+    for row in (
+        Like.objects.filter(user_id__in=user_ids)
+        .exclude(post__author_id__in=user_ids)
+        .values("post_id")
+        .annotate(count=Count("id"))
+    ):
+        liked[row["count"]].append(row["post_id"])
+    for count, post_ids in liked.items():
+        Post.all_objects.filter(pk__in=post_ids).update(
+            like_count=F("like_count") - count, updated_at=now
+        )
+
+    followed = defaultdict(list)
+    for row in (
+        Follow.objects.filter(follower_id__in=user_ids)
+        .exclude(followee_id__in=user_ids)
+        .values("followee_id")
+        .annotate(count=Count("id"))
+    ):
+        followed[row["count"]].append(row["followee_id"])
+    for count, followee_ids in followed.items():
+        User.all_objects.filter(pk__in=followee_ids).update(
+            follower_count=F("follower_count") - count
+        )
+
+    archive_posts(
+        list(
+            Post.all_objects.filter(author_id__in=user_ids).values_list("pk", flat=True)
+        )
+    )
+    users = User.all_objects.filter(pk__in=user_ids)
+    ArchivedUser.objects.bulk_create(
+        [ArchivedUser(**row) for row in users.values(*USER_FIELDS)]
+    )
+    users.delete()
+
+    transaction.on_commit(
+        lambda: caching.invalidate_posts(
+            {post_id for post_ids in liked.values() for post_id in post_ids}
+        )
+    )
+    return len(user_ids)
+
+
+def purge(
+    retention_days: int = None,
+    batch_size: int = None,
+    pause: float = None,
+    max_batches: int = None,
+) -> dict:
+    """Archive expired soft deleted posts, then users. Returns the counts moved."""
+    retention_days = retention_days or settings.SOFT_DELETE_RETENTION_DAYS
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    max_batches = max_batches or settings.PURGE_MAX_BATCHES
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    archived = {"posts": 0, "users": 0}
+    for name, model, archive in (
+        ("posts", Post, archive_posts),
+        ("users", User, archive_users),
+    ):
+        expired = model.all_objects.filter(
+            is_deleted=True, deleted_at__lt=cutoff
+        ).order_by("deleted_at")
+        for _ in range(max_batches):
+            ids = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                archived[name] += archive(ids)
+            time.sleep(pause)
+    return archived
@@ -1,38 +1,193 @@
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
+from functools import lru_cache
 
-import pytz
-from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import AccessToken
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, Token
 
+from core import caching
+from core.models import User
 from core.utils import get_refresh_and_access_tokens
 
+# Tokens expiring within this window are re-issued
+REFRESH_WINDOW = timedelta(hours=6)
+# Parallel requests carrying the same token only re-issue once per interval
+REFRESH_INTERVAL = 60
+VERIFIED_TOKENS_MAX_SIZE = 1024
+# User columns cached for CachedJWTAuthentication
+SNAPSHOT_FIELDS = ("id", "email", "is_superuser", "is_deleted")
+
+
+class CachedUser(SimpleLazyObject):
+    """
+    Stands in for the authenticated ``User``. The snapshot fields are answered
+    without a query, anything else loads the full row on first access.
+    """
+
+    def __init__(self, snapshot: dict):
+        self.__dict__["snapshot"] = snapshot
+        super().__init__(lambda: User.all_objects.get(pk=snapshot["id"]))
+
+    @property
+    def id(self):
+        return self.snapshot["id"]
+
+    pk = id
+
+    @property
+    def email(self):
+        return self.snapshot["email"]
+
+    @property
+    def is_superuser(self):
+        return self.snapshot["is_superuser"]
+
+    @property
+    def is_deleted(self):
+        return self.snapshot["is_deleted"]
+
+    @property
+    def is_staff(self):
+        return self.snapshot["is_superuser"]
+
+    is_active = True
+    is_anonymous = False
+    is_authenticated = True
+
+    def __bool__(self):
+        # SimpleLazyObject would load the row, permission checks call bool()
+        return True
+
+    def __str__(self):
+        return self.email
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` without the per-request user query. The user is
+    built from the token's user id and a snapshot kept in Django's cache,
+    which ``User.save`` invalidates, so updates and soft deletes apply to the
+    next request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        snapshot = caching.get_user_snapshot(user_id)
+        if snapshot is None:
+            snapshot = (
+                User.all_objects.filter(pk=user_id).values(*SNAPSHOT_FIELDS).first()
+            )
+            if snapshot is not None:
+                caching.set_user_snapshot(snapshot)
+        return self.get_cached_user(snapshot)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, the snapshot is read without a thread."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        user_id = self.get_user_id(validated_token)
+        snapshot = await caching.aget_user_snapshot(user_id)
+        if snapshot is None:
+            snapshot = (
+                await User.all_objects.filter(pk=user_id)
+                .values(*SNAPSHOT_FIELDS)
+                .afirst()
+            )
+            if snapshot is not None:
+                await caching.aset_user_snapshot(snapshot)
+        return self.get_cached_user(snapshot), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed(
+                "Token contained no recognizable user identification"
+            )
+
+    def get_cached_user(self, snapshot):
+        if snapshot is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if snapshot["is_deleted"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return CachedUser(snapshot)
+
+
+@lru_cache(maxsize=VERIFIED_TOKENS_MAX_SIZE)
+def verify_access_token(raw_token: str):
+    """
+    Signature checked access token, or None. Expiry is checked by the caller,
+    a cached token may have expired since it was first verified.
+    """
+    try:
+        return AccessToken(raw_token, verify=True)
+    except TokenError:
+        return None
+
 
 class AuthTokenRefreshMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.refresh(request, self.get_response(request))
 
-        try:
-            raw_token = request.headers["Authorization"].split(" ")[1]
-        except (KeyError, IndexError):
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if "Authorization" in request.headers and not isinstance(
+            getattr(request, "auth", None), Token
+        ):
+            # request.user may still be the lazy session user, which queries
+            return await sync_to_async(self.refresh)(request, response)
+        return self.refresh(request, response)
+
+    def refresh(self, request, response):
+        token = self.get_token(request)
+        if token is None or not self.expires_soon(token):
             return response
 
-        try:
-            token = AccessToken(raw_token, True)
-        except TokenError:
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
             return response
 
-        try:
-            current_time = (datetime.now() + timedelta(hours=6)).replace(
-                tzinfo=pytz.UTC
-            )
-            token.check_exp(current_time=current_time)
-        except TokenError:
-            user = request.user
-            refresh_token, access_token = get_refresh_and_access_tokens(user)
-            response["set-auth-token"] = access_token
-            response["set-auth-refresh-token"] = refresh_token
+        if not cache.add(f"auth-refresh:{token['jti']}", True, REFRESH_INTERVAL):
+            return response
 
+        refresh_token, access_token = get_refresh_and_access_tokens(user)
+        response["set-auth-token"] = access_token
+        response["set-auth-refresh-token"] = refresh_token
         return response
+
+    def get_token(self, request):
+        # JWTAuthentication already verified the token for DRF views
+        token = getattr(request, "auth", None)
+        if isinstance(token, Token):
+            return token
+
+        try:
+            raw_token = request.headers["Authorization"].split(" ")[1]
+        except (KeyError, IndexError):
+            return None
+        return verify_access_token(raw_token)
+
+    def expires_soon(self, token) -> bool:
+        now = time.time()
+        return now < token["exp"] <= now + REFRESH_WINDOW.total_seconds()
@@ -0,0 +1,205 @@
+"""
+Endpoint benchmarks over a seeded dataset (see core.seeding).
+
+Requests go through the full Django stack in process with the test client:
+middleware, authentication, views, serializers and the configured database
+and cache, without a network or a server in the way. Every endpoint is
+called ``requests`` times after ``warmup`` unrecorded calls, and the latency
+percentiles and average queries per request are returned as a JSON
+serializable result, tagged with the commit and environment, so results of
+different commits can be compared with ``compare``.
+"""
+import json
+import platform
+import random
+import subprocess
+import time
+import uuid
+from unittest import mock
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import seeding
+from core.management.commands.benchmark_search import WORDS, percentile
+from core.models import Post, User
+from core.querybudget import QueryCounter
+from core.utils import get_refresh_and_access_tokens
+
+# Endpoint name, as reported by core.querybudget, of every benchmark
+ENDPOINTS = {
+    "list": "GET:post-list",
+    "detail": "GET:post-detail",
+    "search": "GET:post-list",
+    "like": "GET:post-like",
+    "unlike": "GET:post-unlike",
+    "login": "POST:auth-login",
+    "signup": "POST:auth-signup",
+    "me": "GET:user-me",
+}
+METRICS = ("p50", "p95", "p99", "queries")
+
+
+def get_commit() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+class Benchmark:
+    def __init__(self, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.user = User.objects.get(email=seeding.seed_email(0))
+        self.user_count = seeding.get_seeded_users().count()
+        self.post_ids = Post.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        self.liked = []
+        self.signed_up = []
+        self.run_id = uuid.uuid4().hex[:8]
+
+        _, access_token = get_refresh_and_access_tokens(self.user)
+        self.client = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
+
+    def random_post_id(self) -> int:
+        return self.rng.randint(self.post_ids["first"], self.post_ids["last"])
+
+    def list(self):
+        return self.authenticated.get(reverse("post-list"))
+
+    def detail(self):
+        return self.authenticated.get(
+            reverse("post-detail", args=[self.random_post_id()])
+        )
+
+    def search(self):
+        return self.authenticated.get(
+            reverse("post-list"), {"q": self.rng.choice(WORDS)}
+        )
+
+    def like(self):
+        post_id = self.random_post_id()
+        self.liked.append(post_id)
+        return self.authenticated.get(reverse("post-like"), {"id": post_id})
+
+    def unlike(self):
+        # Undoes the likes of the like benchmark, the dataset is left unchanged
+        post_id = self.liked.pop() if self.liked else self.random_post_id()
+        return self.authenticated.get(reverse("post-unlike"), {"id": post_id})
+
+    def login(self):
+        email = seeding.seed_email(self.rng.randrange(self.user_count))
+        return self.client.post(
+            reverse("auth-login"), {"email": email, "password": seeding.PASSWORD}
+        )
+
+    def signup(self):
+        email = f"signup-{self.run_id}-{len(self.signed_up)}@{seeding.EMAIL_DOMAIN}"
+        self.signed_up.append(email)
+        return self.client.post(
+            reverse("auth-signup"), {"email": email, "password": seeding.PASSWORD}
+        )
+
+    def me(self):
+        return self.authenticated.get(reverse("user-me"))
+
+    def measure(self, name: str, requests: int, warmup: int) -> dict:
+        call = getattr(self, name)
+        for _ in range(warmup):
+            call()
+
+        latencies = []
+        queries = 0
+        errors = 0
+        for _ in range(requests):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = call()
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries += counter.count
+            errors += response.status_code >= 400
+        latencies.sort()
+        return {
+            "endpoint": ENDPOINTS[name],
+            "requests": requests,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / requests,
+            "queries": queries / requests,
+            "errors": errors,
+        }
+
+    def run(self, names=None, requests: int = 200, warmup: int = 10) -> dict:
+        cache.clear()
+        results = {}
+        # Enrichment runs in Celery, it is not part of the signup request
+        with mock.patch("core.api.auth.views.schedule_enrichment"):
+            for name in names or ENDPOINTS:
+                results[name] = self.measure(name, requests, warmup)
+        User.all_objects.filter(email__in=self.signed_up).delete()
+        return results
+
+
+def get_environment(seed: int = 42) -> dict:
+    """Commit, versions and dataset a run was taken on."""
+    return {
+        **get_commit(),
+        "started_at": timezone.now().isoformat(),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "seed": seed,
+        "dataset": seeding.get_dataset(),
+    }
+
+
+def run(names=None, requests: int = 200, warmup: int = 10, seed: int = 42) -> dict:
+    """Benchmark ``names`` (every endpoint by default) on the seeded dataset."""
+    environment = get_environment(seed)
+    return {**environment, "endpoints": Benchmark(seed).run(names, requests, warmup)}
+
+
+def save(result: dict, path: str):
+    with open(path, "w") as output:
+        json.dump(result, output, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path) as results:
+        return json.load(results)
+
+
+def compare(baseline: dict, result: dict) -> list:
+    """``(benchmark, metric, baseline, result, change %)`` of shared benchmarks."""
+    rows = []
+    for name, metrics in result["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before is None:
+            continue
+        for metric in METRICS:
+            change = (
+                (metrics[metric] - before[metric]) / before[metric] * 100
+                if before[metric]
+                else None
+            )
+            rows.append((name, metric, before[metric], metrics[metric], change))
+    return rows
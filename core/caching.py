@@ -0,0 +1,160 @@
+"""
+Read-through cache for serialized posts.
+
+Post payloads and author payloads are cached separately so that renaming a
+user never leaves stale authors behind in cached posts. List pages only cache
+the ids and cursors of a page and are keyed by a generation number which is
+bumped whenever a post is created, edited or removed.
+
+It also holds the user snapshots CachedJWTAuthentication authenticates
+requests with.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics
+
+# Bump when the shape of PostPublicSerializer changes
+PAYLOAD_VERSION = 3
+LIST_GENERATION_KEY = f"posts:v{PAYLOAD_VERSION}:generation"
+
+
+def post_key(pk) -> str:
+    return f"post:v{PAYLOAD_VERSION}:{pk}"
+
+
+def author_key(pk) -> str:
+    return f"post-author:v{PAYLOAD_VERSION}:{pk}"
+
+
+def new_generation() -> int:
+    # Seeded from the clock so an evicted counter never reuses old page keys
+    return time.time_ns() // 1000
+
+
+def get_list_generation() -> int:
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        cache.add(LIST_GENERATION_KEY, new_generation(), timeout=None)
+        generation = cache.get(LIST_GENERATION_KEY, 0)
+    return generation
+
+
+def page_key(url: str) -> str:
+    return f"posts:v{PAYLOAD_VERSION}:page:{get_list_generation()}:{url}"
+
+
+def get_posts(pks) -> dict:
+    entries = cache.get_many([post_key(pk) for pk in pks])
+    authors = cache.get_many({author_key(e["author_id"]) for e in entries.values()})
+
+    posts = {}
+    for pk in pks:
+        entry = entries.get(post_key(pk))
+        author = entry and authors.get(author_key(entry["author_id"]))
+        if entry and author:
+            posts[pk] = {**entry["data"], "author": author}
+
+    metrics.incr("post-cache:hit", len(posts))
+    metrics.incr("post-cache:miss", len(pks) - len(posts))
+    return posts
+
+
+def set_posts(posts):
+    """Store ``(author_id, payload)`` pairs, payloads without per-viewer fields."""
+    entries = {}
+    for author_id, payload in posts:
+        data = dict(payload)
+        entries[author_key(author_id)] = data.pop("author")
+        entries[post_key(data["id"])] = {"author_id": author_id, "data": data}
+    cache.set_many(entries, timeout=settings.POST_CACHE_TIMEOUT)
+
+
+def get_page(url: str):
+    page = cache.get(page_key(url))
+    metrics.incr("post-cache:page-hit" if page else "post-cache:page-miss")
+    return page
+
+
+def set_page(url: str, ids, next_link, previous_link):
+    cache.set(
+        page_key(url),
+        {"ids": list(ids), "next": next_link, "previous": previous_link},
+        timeout=settings.POST_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_post(pk, membership_changed: bool = True):
+    cache.delete(post_key(pk))
+    if membership_changed:
+        invalidate_post_lists()
+
+
+def invalidate_posts(pks):
+    cache.delete_many([post_key(pk) for pk in pks])
+
+
+def invalidate_post_lists():
+    try:
+        cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        cache.add(LIST_GENERATION_KEY, new_generation(), timeout=None)
+
+
+def invalidate_author(pk):
+    cache.delete(author_key(pk))
+
+
+def user_snapshot_key(pk) -> str:
+    return f"user-snapshot:{pk}"
+
+
+def get_user_snapshot(pk):
+    return cache.get(user_snapshot_key(pk))
+
+
+def set_user_snapshot(snapshot: dict):
+    cache.set(
+        user_snapshot_key(snapshot["id"]),
+        snapshot,
+        timeout=settings.USER_SNAPSHOT_TIMEOUT,
+    )
+
+
+async def aget_user_snapshot(pk):
+    return await cache.aget(user_snapshot_key(pk))
+
+
+async def aset_user_snapshot(snapshot: dict):
+    await cache.aset(
+        user_snapshot_key(snapshot["id"]),
+        snapshot,
+        timeout=settings.USER_SNAPSHOT_TIMEOUT,
+    )
+
+
+def invalidate_user_snapshot(pk):
+    cache.delete(user_snapshot_key(pk))
+
+
+def get_stats() -> dict:
+    counters = metrics.get_counters(
+        "post-cache:hit",
+        "post-cache:miss",
+        "post-cache:page-hit",
+        "post-cache:page-miss",
+    )
+    return {
+        "hits": counters["post-cache:hit"],
+        "misses": counters["post-cache:miss"],
+        "hit_ratio": metrics.hit_ratio(
+            counters["post-cache:hit"], counters["post-cache:miss"]
+        ),
+        "page_hits": counters["post-cache:page-hit"],
+        "page_misses": counters["post-cache:page-miss"],
+        "page_hit_ratio": metrics.hit_ratio(
+            counters["post-cache:page-hit"], counters["post-cache:page-miss"]
+        ),
+    }
@@ -0,0 +1,180 @@
+"""
+Circuit breaker and adaptive concurrency limit for third-party APIs.
+
+State is kept in Django's cache, so every web and Celery process shares one
+breaker per upstream:
+
+* closed: calls go through. ``failure_threshold`` failures within
+  ``failure_window`` seconds open the breaker.
+* open: calls raise ``CircuitOpenError`` without touching the network until
+  ``reset_timeout`` seconds have passed.
+* half-open: a single probe call is let through. Its success closes the
+  breaker, its failure opens it again.
+
+Calls in flight across processes are also capped by a limit that grows by one
+after every call faster than ``latency_target`` and is halved after a slow or
+failed one (additive increase, multiplicative decrease), so a degrading
+upstream gets fewer concurrent requests before it starts failing. The shared
+counters are updated without a lock, the limit is a guide, not a hard bound.
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+from core import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+# Slots leaked by killed processes are freed when the counter expires
+IN_FLIGHT_TIMEOUT = 5 * 60
+
+
+class CircuitOpenError(Exception):
+    """The call was rejected, the upstream is considered unhealthy or saturated."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        failure_window: int,
+        reset_timeout: float,
+        latency_target: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.latency_target = latency_target
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+
+    def key(self, name: str) -> str:
+        return f"circuit:{self.name}:{name}"
+
+    def get_state(self) -> str:
+        opened_until = cache.get(self.key("opened-until"))
+        if opened_until is None:
+            return CLOSED
+        return OPEN if time.time() < opened_until else HALF_OPEN
+
+    def get_limit(self) -> int:
+        return cache.get(self.key("limit"), self.max_concurrency)
+
+    def set_limit(self, limit: int):
+        limit = max(self.min_concurrency, min(self.max_concurrency, limit))
+        if limit != self.get_limit():
+            cache.set(self.key("limit"), limit, timeout=None)
+
+    @contextmanager
+    def call(self):
+        """
+        Guard one upstream call. Raises ``CircuitOpenError`` if the call is
+        rejected, an exception raised inside the block counts as a failure.
+        """
+        state = self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record_failure(state)
+            raise
+        else:
+            self.record_success(state, time.monotonic() - started)
+        finally:
+            self.release()
+
+    def acquire(self) -> str:
+        state = self.get_state()
+        if state == OPEN:
+            self.reject("open")
+
+        key = self.key("in-flight")
+        if cache.add(key, 1, timeout=IN_FLIGHT_TIMEOUT):
+            in_flight = 1
+        else:
+            try:
+                in_flight = cache.incr(key)
+            except ValueError:
+                in_flight = 1
+        if in_flight > self.get_limit():
+            self.release()
+            self.reject("throttled")
+
+        # Only one process probes a half-open upstream
+        if state == HALF_OPEN and not cache.add(
+            self.key("probe"), True, timeout=self.reset_timeout
+        ):
+            self.release()
+            self.reject("open")
+        return state
+
+    def release(self):
+        try:
+            cache.decr(self.key("in-flight"))
+        except ValueError:
+            pass
+
+    def reject(self, reason: str):
+        metrics.incr(self.key(f"rejected-{reason}"))
+        raise CircuitOpenError(f"{self.name} circuit is {reason}")
+
+    def record_success(self, state: str, latency: float):
+        if state == HALF_OPEN:
+            cache.delete_many(
+                [self.key("opened-until"), self.key("probe"), self.key("failures")]
+            )
+        limit = self.get_limit()
+        if latency > self.latency_target:
+            self.set_limit(limit // 2)
+        else:
+            self.set_limit(limit + 1)
+
+    def record_failure(self, state: str):
+        self.set_limit(self.get_limit() // 2)
+        key = self.key("failures")
+        if cache.add(key, 1, timeout=self.failure_window):
+            failures = 1
+        else:
+            try:
+                failures = cache.incr(key)
+            except ValueError:
+                failures = 1
+        if state == HALF_OPEN or failures >= self.failure_threshold:
+            self.open()
+
+    def open(self):
+        cache.set(
+            self.key("opened-until"), time.time() + self.reset_timeout, timeout=None
+        )
+        cache.delete_many([self.key("probe"), self.key("failures")])
+        metrics.incr(self.key("opened"))
+
+    def reset(self):
+        cache.delete_many(
+            [
+                self.key(name)
+                for name in ("opened-until", "probe", "failures", "limit", "in-flight")
+            ]
+        )
+
+    def get_stats(self) -> dict:
+        counters = metrics.get_counters(
+            self.key("opened"),
+            self.key("rejected-open"),
+            self.key("rejected-throttled"),
+        )
+        return {
+            "state": self.get_state(),
+            "limit": self.get_limit(),
+            "in_flight": cache.get(self.key("in-flight"), 0),
+            "failures": cache.get(self.key("failures"), 0),
+            "opened": counters[self.key("opened")],
+            "rejected_open": counters[self.key("rejected-open")],
+            "rejected_throttled": counters[self.key("rejected-throttled")],
+        }
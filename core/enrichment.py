@@ -0,0 +1,279 @@
+"""
+Cached geolocation and public holiday lookups for user meta data.
+
+Lookups go through two tiers: a small in-process LRU, then Django's cache
+(Redis in production), shared by every web and Celery process. Only the
+last tier calls AbstractAPI. Holidays are fetched as one calendar per
+country and year and filtered locally, so all users of a country share a
+single request per year.
+
+With ``GEO_PROVIDER = "local"`` geolocation is answered by the offline index
+in core.geoip instead.
+"""
+import ipaddress
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from core import geoip, metrics
+from core.circuitbreaker import OPEN, CircuitOpenError
+from core.models import User, UserMetaData
+from core.utils import AbstractAPI
+
+# Lookup rejected by the circuit breaker, a failed one returns None
+REJECTED = object()
+
+
+class LocalTTLCache:
+    """Thread-safe LRU whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TwoTierCache:
+    """
+    Read-through cache over a ``LocalTTLCache`` and Django's cache. Failed
+    lookups (None) and empty results are not cached, so they are retried
+    later.
+    """
+
+    def __init__(self, name: str, max_size: int, local_ttl: float, timeout: int):
+        self.name = name
+        self.local = LocalTTLCache(max_size, local_ttl)
+        self.timeout = timeout
+
+    def key(self, key) -> str:
+        return f"{self.name}:{key}"
+
+    def get(self, key, load):
+        value = self.local.get(key)
+        if value is not None:
+            metrics.incr(f"{self.name}:local-hit")
+            return value
+
+        value = cache.get(self.key(key))
+        if value is not None:
+            metrics.incr(f"{self.name}:shared-hit")
+        else:
+            metrics.incr(f"{self.name}:miss")
+            value = load()
+            if not value:
+                return value
+            cache.set(self.key(key), value, timeout=self.timeout)
+        self.local.set(key, value)
+        return value
+
+    def clear(self):
+        self.local.clear()
+
+    def get_stats(self) -> dict:
+        counters = metrics.get_counters(
+            f"{self.name}:local-hit", f"{self.name}:shared-hit", f"{self.name}:miss"
+        )
+        local_hits = counters[f"{self.name}:local-hit"]
+        shared_hits = counters[f"{self.name}:shared-hit"]
+        misses = counters[f"{self.name}:miss"]
+        return {
+            "local_hits": local_hits,
+            "shared_hits": shared_hits,
+            "misses": misses,
+            "hit_ratio": metrics.hit_ratio(local_hits + shared_hits, misses),
+        }
+
+
+geo_cache = TwoTierCache(
+    "geo-cache",
+    max_size=settings.ENRICHMENT_LOCAL_CACHE_SIZE,
+    local_ttl=settings.ENRICHMENT_LOCAL_CACHE_TTL,
+    timeout=settings.GEO_CACHE_TIMEOUT,
+)
+holiday_cache = TwoTierCache(
+    "holiday-cache",
+    max_size=settings.ENRICHMENT_LOCAL_CACHE_SIZE,
+    local_ttl=settings.ENRICHMENT_LOCAL_CACHE_TTL,
+    timeout=settings.HOLIDAY_CACHE_TIMEOUT,
+)
+
+
+def geo_cache_key(ip_address: str) -> str:
+    """The address itself, or its /24 (IPv4) or /64 (IPv6) network."""
+    if not settings.GEO_CACHE_BY_PREFIX:
+        return ip_address
+    try:
+        address = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return ip_address
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def get_geo_data(ip_address: str) -> dict:
+    provider = settings.GEO_PROVIDER
+    if provider == "local":
+        # Microsecond lookups in a shared mapping, nothing to cache
+        return geoip.get_geo_data(ip_address)
+    if provider != "abstractapi":
+        raise ImproperlyConfigured(f"Unknown GEO_PROVIDER {provider!r}")
+
+    geo_data = geo_cache.get(
+        geo_cache_key(ip_address), lambda: AbstractAPI.get_geo_data(ip_address)
+    )
+    if geo_data and geo_data.get("ip_address") != ip_address:
+        # Shared by every address of the network, report the one asked for
+        geo_data = {**geo_data, "ip_address": ip_address}
+    return geo_data
+
+
+def get_holiday_calendar(country_code: str, year: int) -> list:
+    return holiday_cache.get(
+        f"{country_code.upper()}:{year}",
+        lambda: AbstractAPI.get_holiday_calendar(country_code, year),
+    )
+
+
+def get_public_holidays(country_code: str, day: date) -> list:
+    """Holidays of ``country_code`` on ``day``, None if the lookup failed."""
+    if not country_code or day is None:
+        return []
+    calendar = get_holiday_calendar(country_code, day.year)
+    if calendar is None:
+        return None
+    return [
+        holiday
+        for holiday in calendar
+        if holiday_date(holiday) == (day.year, day.month, day.day)
+    ]
+
+
+def holiday_date(holiday: dict):
+    try:
+        return (
+            int(holiday["date_year"]),
+            int(holiday["date_month"]),
+            int(holiday["date_day"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def enrich_users(users) -> int:
+    """
+    Upsert ``UserMetaData`` for ``users`` (with ``signup_ip_address``,
+    ``created_at`` and ``enrichment_attempts`` loaded) in a single query.
+    Every distinct address and country/day of the batch is looked up once.
+    Users without an address are skipped. Users whose lookups were rejected
+    by the circuit breaker are left due, those whose lookups failed are
+    retried after a backoff, up to ``ENRICHMENT_MAX_ATTEMPTS`` times.
+    Returns the number of users written.
+    """
+    users = [user for user in users if user.signup_ip_address]
+    geo_data = {}
+    for ip_address in {user.signup_ip_address for user in users}:
+        try:
+            geo_data[ip_address] = get_geo_data(ip_address)
+        except CircuitOpenError:
+            geo_data[ip_address] = REJECTED
+
+    holidays = {}
+    meta_data = []
+    failed = []
+    for user in users:
+        user_geo_data = geo_data[user.signup_ip_address]
+        if user_geo_data is REJECTED:
+            continue
+        if user_geo_data is None:
+            failed.append(user)
+            continue
+        day = (user_geo_data.get("country_code", ""), user.created_at.date())
+        if day not in holidays:
+            try:
+                holidays[day] = get_public_holidays(*day)
+            except CircuitOpenError:
+                holidays[day] = REJECTED
+        if holidays[day] is REJECTED:
+            continue
+        if holidays[day] is None:
+            failed.append(user)
+            continue
+        meta_data.append(
+            UserMetaData(
+                user=user, geo_data=user_geo_data, public_holidays=holidays[day]
+            )
+        )
+
+    # Running twice, or concurrently, overwrites instead of failing
+    if meta_data:
+        UserMetaData.objects.bulk_create(
+            meta_data,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["geo_data", "public_holidays", "updated_at"],
+        )
+        User.all_objects.filter(pk__in=[row.user_id for row in meta_data]).update(
+            enrichment_retry_at=None
+        )
+    schedule_retries(failed)
+    return len(meta_data)
+
+
+def schedule_retries(users):
+    """Push back the next enrichment of ``users``, or give up after the last."""
+    retries = defaultdict(list)
+    for user in users:
+        retries[user.enrichment_attempts + 1].append(user.pk)
+
+    now = timezone.now()
+    for attempts, user_ids in retries.items():
+        retry_at = None
+        if attempts < settings.ENRICHMENT_MAX_ATTEMPTS:
+            backoff = settings.ENRICHMENT_RETRY_BACKOFF * 2 ** (attempts - 1)
+            retry_at = now + timedelta(seconds=backoff)
+        User.all_objects.filter(pk__in=user_ids).update(
+            enrichment_attempts=attempts, enrichment_retry_at=retry_at
+        )
+
+
+def get_stats() -> dict:
+    return {"geo": geo_cache.get_stats(), "holidays": holiday_cache.get_stats()}
+
+
+def get_breaker_stats() -> dict:
+    return AbstractAPI.breaker.get_stats()
+
+
+def is_upstream_open() -> bool:
+    """Whether AbstractAPI lookups are rejected without being attempted."""
+    return AbstractAPI.breaker.get_state() == OPEN
@@ -0,0 +1,170 @@
+"""
+Offline IP range to country lookups.
+
+The index is a flat file of fixed-size records sorted by range start::
+
+    header:  MAGIC, record count (uint64)
+    record:  start (16 bytes) | end (16 bytes) | country code (2 bytes)
+
+Addresses are stored as 16-byte big-endian integers, IPv4 mapped into
+``::ffff:0:0/96``, so byte order equals numeric order and both families
+share one index. The file is memory-mapped read-only: worker processes share
+the page cache instead of each loading the dataset, and a lookup is a binary
+search over the mapping.
+"""
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+MAGIC = b"GEOIP\x00\x00\x01"
+HEADER = struct.Struct(">8sQ")
+ADDRESS_SIZE = 16
+RECORD_SIZE = 2 * ADDRESS_SIZE + 2
+IPV4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+# How often a process checks whether the index file was rebuilt
+RELOAD_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+def address_key(value) -> bytes:
+    """16-byte key of an IP address given as text or as an integer."""
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    address = ipaddress.ip_address(value)
+    if address.version == 4:
+        return IPV4_MAPPED_PREFIX + address.packed
+    return address.packed
+
+
+def build_index(rows, path: str) -> int:
+    """
+    Write ``(start, end, country_code)`` rows to an index at ``path``. The
+    file is replaced atomically, processes keep reading the old mapping until
+    they reload.
+    """
+    records = sorted(
+        (address_key(start), address_key(end), country_code.upper().encode("ascii"))
+        for start, end, country_code in rows
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as output:
+        output.write(HEADER.pack(MAGIC, len(records)))
+        for start, end, country_code in records:
+            output.write(start + end + country_code[:2].ljust(2))
+    os.replace(output.name, path)
+    return len(records)
+
+
+def read_csv(path: str):
+    """
+    Rows of a ``start,end,country_code[,...]`` CSV, addresses as text or
+    integers. Header and malformed lines are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as source:
+        for row in csv.reader(source):
+            if len(row) < 3 or len(row[2].strip()) != 2:
+                continue
+            start, end, country_code = (value.strip() for value in row[:3])
+            try:
+                address_key(start), address_key(end)
+            except ValueError:
+                continue
+            yield start, end, country_code
+
+
+class GeoIPIndex:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as index:
+            self.inode = os.fstat(index.fileno()).st_ino
+            self.map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a GeoIP index")
+
+    def record(self, index: int) -> int:
+        return HEADER.size + index * RECORD_SIZE
+
+    def lookup(self, ip_address: str):
+        """Country code of ``ip_address``, or None."""
+        try:
+            key = address_key(ip_address)
+        except ValueError:
+            return None
+
+        # Last range starting at or before the address
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.record(middle)
+            if self.map[offset : offset + ADDRESS_SIZE] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+
+        offset = self.record(low - 1) + ADDRESS_SIZE
+        if self.map[offset : offset + ADDRESS_SIZE] < key:
+            return None
+        offset += ADDRESS_SIZE
+        return self.map[offset : offset + 2].decode("ascii")
+
+    def close(self):
+        self.map.close()
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index():
+    """The shared index of ``settings.GEOIP_INDEX_PATH``, None if unusable."""
+    global _index, _checked_at
+    path = settings.GEOIP_INDEX_PATH
+    now = time.monotonic()
+    if (
+        _index is not None
+        and _index.path == path
+        and now - _checked_at < RELOAD_INTERVAL
+    ):
+        return _index
+
+    with _lock:
+        _checked_at = now
+        try:
+            inode = os.stat(path).st_ino
+        except OSError:
+            _index = None
+            return None
+        if _index is None or _index.path != path or _index.inode != inode:
+            try:
+                _index = GeoIPIndex(path)
+            except (OSError, ValueError, struct.error) as ex:
+                logger.warning("GeoIP index %s cannot be read: %s", path, ex)
+                _index = None
+        return _index
+
+
+def get_geo_data(ip_address: str) -> dict:
+    """
+    Geolocation in the shape of ``AbstractAPI.get_geo_data``, country only.
+    Without a usable index the lookup fails (None), like a failed API call.
+    """
+    index = get_index()
+    if index is None:
+        return None
+    country_code = index.lookup(ip_address)
+    if not country_code:
+        return {}
+    return {"ip_address": ip_address, "country_code": country_code}
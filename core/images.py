@@ -0,0 +1,113 @@
+"""
+Profile picture storage and variants.
+
+Uploads are stored content-addressed, under the SHA-256 of their bytes, so an
+identical upload reuses the stored file. Variants are derived from that
+digest (``images/<digest>/<variant>.<format>``), so they are only ever
+rendered once per distinct picture.
+
+Variants are re-encoded from pixel data only: EXIF (camera, GPS), ICC and
+other metadata never leave the original, which the API does not expose.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from core.models import image_folder
+
+# Square crops, plus one bounded copy for viewing the full picture
+VARIANT_SIZES = {"small": 64, "medium": 256, "large": 1024}
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+QUALITY = 85
+
+
+def content_name(upload) -> str:
+    """Storage name of ``upload`` from the digest of its content."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(upload.name)[1].lower() or ".img"
+    return image_folder(None, f"{digest.hexdigest()}{extension}")
+
+
+def save_upload(upload) -> str:
+    """Store ``upload`` unless identical content is already stored."""
+    name = content_name(upload)
+    if default_storage.exists(name):
+        return name
+    upload.seek(0)
+    return default_storage.save(name, upload)
+
+
+def variant_name(name: str, variant: str, extension: str) -> str:
+    digest = os.path.splitext(os.path.basename(name))[0]
+    return image_folder(None, f"{digest}/{variant}.{extension}")
+
+
+def get_variant_names(name: str) -> dict:
+    return {
+        variant: {
+            extension: variant_name(name, variant, extension) for extension in FORMATS
+        }
+        for variant in VARIANT_SIZES
+    }
+
+
+def render(image: Image.Image, variant: str) -> Image.Image:
+    size = VARIANT_SIZES[variant]
+    if variant == "large":
+        image = image.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    else:
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    image.info = {}
+    return image
+
+
+def encode(image: Image.Image, image_format: str) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def create_variants(name: str) -> dict:
+    """Render the missing variants of the stored picture ``name``."""
+    names = get_variant_names(name)
+    missing = [
+        (variant, extension, variant_names[extension])
+        for variant, variant_names in names.items()
+        for extension in FORMATS
+        if not default_storage.exists(variant_names[extension])
+    ]
+    if not missing:
+        return names
+
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    rendered = {}
+    for variant, extension, variant_file in missing:
+        if variant not in rendered:
+            rendered[variant] = render(image, variant)
+        default_storage.save(
+            variant_file, ContentFile(encode(rendered[variant], FORMATS[extension]))
+        )
+    return names
+
+
+def variant_urls(variants) -> dict:
+    """``{variant: {format: url}}`` of stored variant names, None if missing."""
+    if not variants:
+        return None
+    return {
+        variant: {
+            extension: default_storage.url(name) for extension, name in names.items()
+        }
+        for variant, names in variants.items()
+    }
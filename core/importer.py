@@ -0,0 +1,107 @@
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from core import caching
+from core.api.posts.serializers import PostImportSerializer
+from core.models import Post, User
+from core.utils import SLUG_INSERT_ATTEMPTS, allocate_post_slugs
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class PostImporter:
+    """
+    Imports posts from NDJSON lines, one ``{"author": email, "message": ...}``
+    object per line. Lines are consumed lazily and validated and inserted one
+    chunk at a time, so memory use does not depend on the size of the input.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        # Built once, binding serializer fields per line dominates the cost
+        self.serializer = PostImportSerializer()
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, lines) -> dict:
+        numbered = enumerate(lines, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+
+        if self.created:
+            caching.invalidate_post_lists()
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+    def import_chunk(self, chunk):
+        rows = []
+        for line_number, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                self.add_error(line_number, {"non_field_errors": ["Invalid JSON"]})
+                continue
+
+            try:
+                rows.append((line_number, self.serializer.run_validation(data)))
+            except ValidationError as error:
+                self.add_error(line_number, error.detail)
+
+        authors = dict(
+            User.objects.filter(
+                email__in={row["author"] for _, row in rows}
+            ).values_list("email", "pk")
+        )
+        posts = []
+        for line_number, row in rows:
+            if row["author"] not in authors:
+                self.add_error(line_number, {"author": ["Unknown author"]})
+                continue
+            posts.append(
+                (
+                    line_number,
+                    Post(author_id=authors[row["author"]], message=row["message"]),
+                )
+            )
+
+        if posts:
+            self.insert_posts(posts)
+        self.errors.sort(key=lambda error: error["line"])
+
+    def insert_posts(self, posts):
+        """
+        Insert one chunk of ``(line number, post)``. Like ``create_post``, the
+        insert is repeated with fresh slugs when a concurrent request took
+        one in between. A chunk that still fails is reported, not raised, so
+        earlier chunks stay reported as created.
+        """
+        for _ in range(SLUG_INSERT_ATTEMPTS):
+            slugs = allocate_post_slugs([post.message for _, post in posts])
+            for (_, post), slug in zip(posts, slugs):
+                post.slug = slug
+            try:
+                with transaction.atomic():
+                    Post.objects.bulk_create([post for _, post in posts])
+            except IntegrityError:
+                continue
+            self.created += len(posts)
+            return
+
+        for line_number, _ in posts:
+            self.add_error(
+                line_number, {"non_field_errors": ["Could not be inserted, retry"]}
+            )
+
+    def add_error(self, line_number: int, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "errors": errors})
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark, seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a dataset and measure latency and queries per request of the key "
+        "endpoints, optionally saving the results and comparing with a saved run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=seeding.SCALES, default="10k")
+        parser.add_argument("--posts", type=int, help="Overrides --scale")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--endpoints", nargs="+", choices=benchmark.ENDPOINTS, default=None
+        )
+        parser.add_argument("--output", help="Save the results to this JSON file")
+        parser.add_argument("--compare", help="Results JSON file of a previous run")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+        baseline = benchmark.load(options["compare"]) if options["compare"] else None
+
+        posts = options["posts"] or seeding.SCALES[options["scale"]]
+        dataset = seeding.seed(posts, options["seed"], options["batch_size"])
+        self.stdout.write(
+            f"database={connection.vendor} users={dataset['users']} "
+            f"posts={dataset['posts']} likes={dataset['likes']}"
+        )
+
+        result = benchmark.run(
+            options["endpoints"],
+            options["requests"],
+            options["warmup"],
+            options["seed"],
+        )
+        for name, metrics in result["endpoints"].items():
+            self.stdout.write(
+                f"{name:<8}"
+                + " ".join(
+                    f"p{percent} {metrics[f'p{percent}']:.2f}ms"
+                    for percent in (50, 95, 99)
+                )
+                + f" queries {metrics['queries']:.1f} errors {metrics['errors']}"
+            )
+
+        if options["output"]:
+            benchmark.save(result, options["output"])
+            self.stdout.write(f"Saved {options['output']}")
+
+        if baseline:
+            self.stdout.write(f"Compared with {baseline['commit'] or 'unknown commit'}")
+            for name, metric, before, after, change in benchmark.compare(
+                baseline, result
+            ):
+                self.stdout.write(
+                    f"{name:<8}{metric:<8}{before:>10.2f} -> {after:>10.2f}"
+                    + (f" {change:+.1f}%" if change is not None else "")
+                )
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_search import percentile
+from core.models import Post, User
+from core.utils import get_refresh_and_access_tokens
+
+SERVERS = {
+    "sync": [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "social_network_backend.wsgi",
+        "--workers",
+        "{workers}",
+        "--bind",
+        "127.0.0.1:{port}",
+    ],
+    "async": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "social_network_backend.asgi:application",
+        "--workers",
+        "{workers}",
+        "--port",
+        "{port}",
+        "--no-access-log",
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync (gunicorn, WSGI) and async (uvicorn, ASGI) "
+        "post list endpoints with the same number of worker processes. The sync "
+        "list caches its pages and the async one does not, so the post caches "
+        "are turned off unless --post-cache is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--concurrency", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--posts", type=int, default=1000)
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help="Connections that send an incomplete request and hold it open",
+        )
+        parser.add_argument("--sync-path", default="/api/posts")
+        parser.add_argument("--async-path", default="/api/async/posts")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--post-cache",
+            action="store_true",
+            help="Keep the post and page caches of the sync list on",
+        )
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email="asgi-benchmark@example.com")
+        missing = options["posts"] - Post.objects.filter(author=user).count()
+        if missing > 0:
+            Post.objects.bulk_create(
+                Post(author=user, message=f"benchmark post {i}") for i in range(missing)
+            )
+        _, access_token = get_refresh_and_access_tokens(user)
+        environment = dict(os.environ)
+        if not options["post_cache"]:
+            # Both servers then query the same page on every request
+            environment["POST_CACHE_TIMEOUT"] = "0"
+
+        for name, path in (
+            ("sync", options["sync_path"]),
+            ("async", options["async_path"]),
+        ):
+            command = [
+                part.format(workers=options["workers"], port=options["port"])
+                for part in SERVERS[name]
+            ]
+            server = subprocess.Popen(
+                command,
+                env=environment,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                self.wait_for_port(options["port"])
+                completed, errors, latencies = asyncio.run(
+                    self.load(path, access_token, options)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+
+            latencies.sort()
+            self.stdout.write(
+                f"{name:<5} {path} workers={options['workers']} "
+                f"concurrency={options['concurrency']} "
+                f"slow-clients={options['slow_clients']} "
+                f"post-cache={'on' if options['post_cache'] else 'off'} "
+                f"rps={completed / options['duration']:.1f} errors={errors} "
+                + " ".join(
+                    f"p{percent}={percentile(latencies, percent):.1f}ms"
+                    for percent in (50, 95, 99)
+                    if latencies
+                )
+            )
+
+    def wait_for_port(self, port: int, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"Server did not start on port {port}")
+
+    async def load(self, path: str, access_token: str, options):
+        port = options["port"]
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Authorization: Bearer {access_token}\r\nConnection: close\r\n\r\n"
+        ).encode("ascii")
+        deadline = time.monotonic() + options["duration"]
+        latencies = []
+        errors = 0
+
+        # Slow clients send part of a request and then stall
+        slow = []
+        for _ in range(options["slow_clients"]):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request[:16])
+            slow.append(writer)
+
+        async def client():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection("127.0.0.1", port), timeout=5
+                    )
+                    writer.write(request)
+                    status_line = await asyncio.wait_for(reader.readline(), timeout=30)
+                    await reader.read()
+                    writer.close()
+                except (OSError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                if b" 200 " not in status_line:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(client() for _ in range(options["concurrency"])))
+        for writer in slow:
+            writer.close()
+        return len(latencies), errors, latencies
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import AuthTokenRefreshMiddleware, verify_access_token
+from core.management.commands.benchmark_search import percentile
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request cost of JWT authentication and token refresh"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email="auth-benchmark@example.com")
+        fresh = AccessToken.for_user(user)
+        expiring = AccessToken.for_user(user)
+        expiring.set_exp(lifetime=timedelta(hours=1))
+
+        authentication = JWTAuthentication()
+        middleware = AuthTokenRefreshMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+
+        def request_for(token, authenticated: bool):
+            request = factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            request.user = user
+            if authenticated:
+                request.auth = token
+            return request
+
+        scenarios = {
+            # Building the request is part of the drf and middleware timings
+            "baseline": lambda: request_for(fresh, True),
+            # What the middleware paid on every request before reusing request.auth
+            "verify token": lambda: AccessToken(str(fresh)),
+            "drf authenticate": lambda: authentication.authenticate(
+                Request(request_for(fresh, False))
+            ),
+            "middleware, drf token": lambda: middleware(request_for(fresh, True)),
+            "middleware, lru fallback": lambda: middleware(request_for(fresh, False)),
+            "middleware, expiring token": lambda: middleware(
+                request_for(expiring, True)
+            ),
+        }
+
+        cache.clear()
+        verify_access_token.cache_clear()
+        for name, scenario in scenarios.items():
+            latencies = []
+            for _ in range(options["requests"]):
+                started = time.perf_counter()
+                scenario()
+                latencies.append((time.perf_counter() - started) * 1_000_000)
+            latencies.sort()
+            self.stdout.write(
+                f"{name:<28}"
+                + " ".join(
+                    f"p{percent} {percentile(latencies, percent):.1f}us"
+                    for percent in (50, 95, 99)
+                )
+            )
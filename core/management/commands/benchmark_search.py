@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Post, User
+from core.search import get_post_search_backend
+
+WORDS = (
+    "morning coffee travel football music weekend holiday sunset concert "
+    "launch release update garden recipe running training family friends "
+    "birthday city mountain river beach book movie series photo design "
+    "startup product meeting deadline market weather storm festival kitchen"
+).split()
+
+
+def percentile(values: list, percent: float) -> float:
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = "Seed posts up to --posts and measure PostFilter.q search latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        self.seed_posts(rng, options["posts"], options["batch_size"])
+
+        backend = get_post_search_backend()
+        queryset = Post.objects.all()
+        page_size = options["page_size"]
+
+        started = time.perf_counter()
+        list(backend.search(queryset, WORDS[0])[:1])
+        warm_up = (time.perf_counter() - started) * 1000
+
+        terms = [rng.choice(WORDS) for _ in range(options["queries"])]
+        # Mix in substrings so the trigram path is exercised as well
+        terms = [
+            term if i % 2 else term[1 : len(term) - 1] for i, term in enumerate(terms)
+        ]
+
+        latencies = []
+        for term in terms:
+            started = time.perf_counter()
+            list(
+                backend.search(queryset, term).order_by("-created_at", "-id")[
+                    :page_size
+                ]
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+
+        self.stdout.write(
+            f"backend={type(backend).__name__} "
+            f"posts={Post.objects.count()} queries={len(latencies)}"
+        )
+        self.stdout.write(f"warm-up {warm_up:.2f}ms")
+        for percent in (50, 95, 99):
+            self.stdout.write(f"p{percent} {percentile(latencies, percent):.2f}ms")
+
+    def seed_posts(self, rng: random.Random, target: int, batch_size: int):
+        missing = target - Post.objects.count()
+        if missing <= 0:
+            return
+
+        author, _ = User.objects.get_or_create(email="search-benchmark@example.com")
+        while missing > 0:
+            size = min(batch_size, missing)
+            Post.objects.bulk_create(
+                Post(
+                    author=author,
+                    message=" ".join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                )
+                for _ in range(size)
+            )
+            missing -= size
+            self.stdout.write(f"seeded {target - missing}/{target} posts")
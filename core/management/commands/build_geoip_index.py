@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import geoip
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the local GeoIP index from a start,end,country_code CSV "
+        "(addresses as text or integers, e.g. IP2Location LITE DB1)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv")
+        parser.add_argument("--output", help="Defaults to settings.GEOIP_INDEX_PATH")
+
+    def handle(self, *args, **options):
+        output = options["output"] or settings.GEOIP_INDEX_PATH
+        count = geoip.build_index(geoip.read_csv(options["csv"]), output)
+        self.stdout.write(f"indexed {count} ranges into {output}")
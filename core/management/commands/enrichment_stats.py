@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import enrichment
+
+
+class Command(BaseCommand):
+    help = (
+        "Show hit ratios of the geolocation and holiday lookup caches and the "
+        "state of the AbstractAPI circuit breaker"
+    )
+
+    def handle(self, *args, **options):
+        for name, stats in enrichment.get_stats().items():
+            self.stdout.write(
+                f"{name:<9} hit_ratio={stats['hit_ratio']:.2%} "
+                f"local_hits={stats['local_hits']} shared_hits={stats['shared_hits']} "
+                f"misses={stats['misses']}"
+            )
+
+        stats = enrichment.get_breaker_stats()
+        self.stdout.write(
+            f"{'breaker':<9} state={stats['state']} limit={stats['limit']} "
+            f"in_flight={stats['in_flight']} failures={stats['failures']} "
+            f"opened={stats['opened']} rejected_open={stats['rejected_open']} "
+            f"rejected_throttled={stats['rejected_throttled']}"
+        )
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.exporter import CHUNK_SIZE, EXPORTS, Exporter
+
+
+class Command(BaseCommand):
+    help = "Stream users and posts as NDJSON to a file, use - for stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--models", nargs="+", choices=list(EXPORTS))
+        parser.add_argument(
+            "--since", help="Only rows updated at or after this ISO 8601 datetime"
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                raise CommandError(f"Invalid datetime: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        models = options["models"]
+        exporter = Exporter(
+            models=models and [name for name in EXPORTS if name in models],
+            since=since,
+            chunk_size=options["chunk_size"],
+            compress=options["gzip"],
+        )
+        if options["path"] == "-":
+            self.write(exporter, sys.stdout.buffer)
+        else:
+            with open(options["path"], "wb") as output:
+                self.write(exporter, output)
+
+        self.stderr.write(f"exported={exporter.exported}")
+
+    def write(self, exporter, output):
+        for chunk in exporter.chunks():
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.importer import CHUNK_SIZE, PostImporter
+
+
+class Command(BaseCommand):
+    help = "Import posts from an NDJSON file, use - to read from stdin"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        importer = PostImporter(chunk_size=options["chunk_size"])
+        if options["path"] == "-":
+            result = importer.run(sys.stdin.buffer)
+        else:
+            with open(options["path"], "rb") as lines:
+                result = importer.run(lines)
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(f"created={result['created']} failed={result['failed']}")
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core import querybudget
+
+METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+
+def url_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class Command(BaseCommand):
+    help = (
+        "Show queries per request of every endpoint, as recorded by "
+        "QueryBudgetMiddleware, with how often it went over budget or "
+        "repeated a query"
+    )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            f"{method}:{name}"
+            for name in sorted(set(url_names(get_resolver().url_patterns)))
+            for method in METHODS
+        ]
+        rows = querybudget.get_report(endpoints)
+        if not rows:
+            self.stdout.write("No requests recorded, is QUERY_BUDGET_ENABLED set?")
+            return
+
+        self.stdout.write(
+            f"{'endpoint':<32}{'requests':>10}{'queries':>9}{'budget':>8}"
+            f"{'over':>7}{'n+1':>7}"
+        )
+        for endpoint, requests, queries, over_budget, repeated in sorted(
+            rows, key=lambda row: -row[2]
+        ):
+            self.stdout.write(
+                f"{endpoint:<32}{requests:>10}{queries:>9.1f}"
+                f"{querybudget.get_budget(endpoint):>8}{over_budget:>7}{repeated:>7}"
+            )
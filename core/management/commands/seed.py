@@ -0,0 +1,83 @@
+import os
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic users, meta data, posts and likes in bulk across "
+        "worker processes, deterministically from --seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument(
+            "--max-likes-per-post", type=int, default=seeding.MAX_LIKES_PER_POST
+        )
+        parser.add_argument("--no-meta-data", action="store_true")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes, always 1 on SQLite",
+        )
+        parser.add_argument(
+            "--target-rate",
+            type=int,
+            help="Rows per second the run is expected to sustain, by default "
+            f"{seeding.TARGET_ROWS_PER_SECOND_PER_WORKER} per worker",
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete previously seeded data first"
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 and options["posts"]:
+            raise CommandError("Posts need at least one user")
+        if seeding.get_seeded_users().exists():
+            if not options["clear"]:
+                raise CommandError("Seeded data already exists, use --clear")
+            seeding.clear()
+
+        workers = seeding.get_workers(options["workers"])
+        self.stdout.write(f"database={connection.vendor} workers={workers}")
+        rows = Counter()
+
+        def progress(name: str, count: int):
+            rows[name] += count
+            self.stdout.write(f"{name} {rows[name]} rows")
+
+        seconds = seeding.generate(
+            options["users"],
+            options["posts"],
+            max_likes=options["max_likes_per_post"],
+            meta_data=not options["no_meta_data"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            workers=workers,
+            progress=progress,
+        )
+
+        target = options["target_rate"] or (
+            seeding.TARGET_ROWS_PER_SECOND_PER_WORKER * workers
+        )
+        total = sum(rows.values())
+        rate = total / seconds if seconds else 0
+        dataset = seeding.get_dataset()
+        self.stdout.write(
+            " ".join(f"{name}={count}" for name, count in dataset.items())
+        )
+        self.stdout.write(f"{total} rows in {seconds:.1f}s, {rate:.0f} rows/s")
+        if rate < target:
+            self.stdout.write(
+                self.style.WARNING(f"Below the target of {target} rows/s")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Target of {target} rows/s met"))
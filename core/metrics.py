@@ -0,0 +1,25 @@
+from django.core.cache import cache
+
+KEY_PREFIX = "metrics"
+
+
+def incr(name: str, delta: int = 1):
+    """Increment a counter shared by every worker through the default cache."""
+    if not delta:
+        return
+    key = f"{KEY_PREFIX}:{name}"
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def get_counters(*names: str) -> dict:
+    values = cache.get_many([f"{KEY_PREFIX}:{name}" for name in names])
+    return {name: values.get(f"{KEY_PREFIX}:{name}", 0) for name in names}
+
+
+def hit_ratio(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
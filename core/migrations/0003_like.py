@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def copy_likes(apps, schema_editor):
+    Post = apps.get_model("core", "Post")
+    Like = apps.get_model("core", "Like")
+    PostLikes = Post.likes.through
+
+    batch = []
+    for post_id, user_id in (
+        PostLikes.objects.order_by("pk")
+        .values_list("post_id", "user_id")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        batch.append(Like(post_id=post_id, user_id=user_id))
+        if len(batch) >= BATCH_SIZE:
+            Like.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    Like.objects.bulk_create(batch, ignore_conflicts=True)
+
+    like_count = (
+        Like.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Post.objects.update(like_count=Coalesce(Subquery(like_count), 0))
+
+
+def restore_likes(apps, schema_editor):
+    Post = apps.get_model("core", "Post")
+    Like = apps.get_model("core", "Like")
+    PostLikes = Post.likes.through
+
+    batch = []
+    for post_id, user_id in (
+        Like.objects.order_by("pk")
+        .values_list("post_id", "user_id")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        batch.append(PostLikes(post_id=post_id, user_id=user_id))
+        if len(batch) >= BATCH_SIZE:
+            PostLikes.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PostLikes.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_post_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="like_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="Like",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.post"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.UniqueConstraint(
+                fields=("post", "user"), name="unique_post_like"
+            ),
+        ),
+        migrations.RunPython(copy_likes, restore_likes),
+        migrations.RemoveField(
+            model_name="post",
+            name="likes",
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="likes",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="likes",
+                through="core.Like",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
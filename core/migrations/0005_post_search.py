@@ -0,0 +1,66 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:03
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The GIN indexes and the trigger only exist on PostgreSQL, other backends
+# (SQLite in local test runs) fall back to core.search.InMemoryPostSearch.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION core_post_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('english', COALESCE(NEW.message, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER core_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF message ON core_post
+    FOR EACH ROW EXECUTE FUNCTION core_post_search_vector_update()
+    """,
+    "UPDATE core_post SET search_vector = to_tsvector('english', COALESCE(message, ''))",
+    "CREATE INDEX post_search_vector_idx ON core_post USING gin (search_vector)",
+    # Matches the UPPER("message"::text) LIKE UPPER(...) emitted for icontains
+    """
+    CREATE INDEX post_message_trgm_idx
+    ON core_post USING gin ((UPPER(message::text)) gin_trgm_ops)
+    """,
+]
+
+BACKWARD_SQL = [
+    "DROP INDEX IF EXISTS post_message_trgm_idx",
+    "DROP INDEX IF EXISTS post_search_vector_idx",
+    "DROP TRIGGER IF EXISTS core_post_search_vector_trigger ON core_post",
+    "DROP FUNCTION IF EXISTS core_post_search_vector_update()",
+]
+
+
+def run_postgres_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0004_like_post_created_at_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            run_postgres_sql(FORWARD_SQL), run_postgres_sql(BACKWARD_SQL)
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0006_follow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="usermetadata",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
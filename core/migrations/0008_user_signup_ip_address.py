@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0007_user_meta_data_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="signup_ip_address",
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
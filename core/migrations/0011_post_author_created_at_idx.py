@@ -0,0 +1,20 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0010_soft_delete_indexes_and_archive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["author", "-created_at", "-id"],
+                name="post_author_created_at_idx",
+            ),
+        ),
+    ]
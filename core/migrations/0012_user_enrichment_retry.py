@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_pending(apps, schema_editor):
+    # Users the previous anti-join would have picked up
+    User = apps.get_model("core", "User")
+    User.objects.filter(meta_data__isnull=True, signup_ip_address__isnull=False).update(
+        enrichment_retry_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0011_post_author_created_at_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="enrichment_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="enrichment_retry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(
+                    ("enrichment_retry_at__isnull", False), ("is_deleted", False)
+                ),
+                fields=["id"],
+                name="user_enrichment_pending_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,22 @@
 from django.contrib.auth.base_user import BaseUserManager, AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
-from django.db import models
-from django.db.models import JSONField
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    JSONField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from core import caching
+
 
 class ModelMetaData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
@@ -20,7 +33,17 @@ class ModelMetaData(models.Model):
         self.save()
 
 
-class UserManager(BaseUserManager):
+class SoftDeleteManager(models.Manager):
+    """
+    Default manager of soft deletable models, leaves out soft deleted rows.
+    Their ``all_objects`` manager includes them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class UserManager(SoftDeleteManager, BaseUserManager):
     def create_user(self, **other_fields):
         password = other_fields.pop("password", None)
         user = self.model(**other_fields)
@@ -45,12 +68,46 @@ class User(ModelMetaData, PermissionsMixin, AbstractBaseUser):
     password = models.CharField(max_length=2048, null=False, blank=False)
     email_verified = models.BooleanField(default=False, blank=False, null=False)
     profile_picture = models.ImageField(upload_to=image_folder, blank=True, null=True)
+    # Storage names of the resized copies, see core.images
+    profile_picture_variants = JSONField(null=True, blank=True)
+    follower_count = models.PositiveIntegerField(default=0)
+    # Read by core.tasks.enrich_pending_users to fill in UserMetaData
+    signup_ip_address = models.GenericIPAddressField(null=True, blank=True)
+    # When the next enrichment is due, None once done or given up on
+    enrichment_retry_at = models.DateTimeField(null=True, blank=True)
+    enrichment_attempts = models.PositiveSmallIntegerField(default=0)
     objects = UserManager()
+    all_objects = BaseUserManager()
+
+    class Meta:
+        indexes = [
+            # Keyset scans over live users skip the soft deleted ones
+            models.Index(
+                fields=["id"], condition=Q(is_deleted=False), name="user_live_id_idx"
+            ),
+            # Rows waiting for core.archive.purge, small by construction
+            models.Index(
+                fields=["deleted_at"],
+                condition=Q(is_deleted=True),
+                name="user_deleted_at_idx",
+            ),
+            # Keyset scans over users waiting for enrichment, small as well
+            models.Index(
+                fields=["id"],
+                condition=Q(enrichment_retry_at__isnull=False, is_deleted=False),
+                name="user_enrichment_pending_idx",
+            ),
+        ]
 
     @property
     def is_staff(self):
         return self.is_superuser
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        caching.invalidate_author(self.pk)
+        caching.invalidate_user_snapshot(self.pk)
+
     def __str__(self):
         return self.email
 
@@ -61,13 +118,233 @@ class UserMetaData(models.Model):
     )
     geo_data = JSONField(null=True, blank=True)
     public_holidays = JSONField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+
+class PostQuerySet(models.QuerySet):
+    def with_liked_by_me(self, user):
+        if not user.is_authenticated:
+            return self.annotate(liked_by_me=Value(False))
+        return self.annotate(
+            liked_by_me=Exists(
+                Like.objects.filter(post=OuterRef("pk"), user_id=user.pk)
+            )
+        )
 
 
 class Post(ModelMetaData):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="author")
     message = models.CharField(max_length=2048, null=True, blank=True)
     slug = models.CharField(max_length=255, null=True, blank=True, unique=True)
-    likes = models.ManyToManyField(to=User, blank=True, related_name="likes")
+    like_count = models.PositiveIntegerField(default=0)
+    # Maintained by a database trigger on PostgreSQL, see core.search
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    likes = models.ManyToManyField(
+        to=User, blank=True, related_name="likes", through="Like"
+    )
+    objects = SoftDeleteManager.from_queryset(PostQuerySet)()
+    all_objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=Q(is_deleted=False),
+                name="post_live_created_at_idx",
+            ),
+            # An author's posts by recency, filtered and paginated with the
+            # same keyset as the list
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                condition=Q(is_deleted=False),
+                name="post_author_created_at_idx",
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                condition=Q(is_deleted=True),
+                name="post_deleted_at_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        caching.invalidate_post(self.pk)
 
     def __str__(self):
         return self.message or f"Post ID - {self.pk}"
+
+
+class LikeManager(models.Manager):
+    # Every write locks the post row before touching its likes, so concurrent
+    # likes of the same post queue up on the post instead of deadlocking
+
+    def like(self, post: Post, user: User) -> bool:
+        try:
+            with transaction.atomic():
+                # updated_at is part of the representation, and so of its ETag
+                Post.all_objects.filter(pk=post.pk).update(
+                    like_count=F("like_count") + 1, updated_at=timezone.now()
+                )
+                self.create(post=post, user=user)
+        except IntegrityError:
+            return False
+        caching.invalidate_post(post.pk, membership_changed=False)
+        return True
+
+    def unlike(self, post: Post, user: User) -> bool:
+        with transaction.atomic():
+            lock_posts([post.pk])
+            deleted, _ = self.filter(post=post, user=user).delete()
+            if deleted:
+                Post.all_objects.filter(pk=post.pk).update(
+                    like_count=F("like_count") - 1, updated_at=timezone.now()
+                )
+        if deleted:
+            caching.invalidate_post(post.pk, membership_changed=False)
+        return bool(deleted)
+
+    def like_many(self, user: User, post_ids) -> set:
+        """Like every existing post in ``post_ids``, returns the ids newly liked."""
+        with transaction.atomic():
+            post_ids = lock_posts(post_ids, Post.objects)
+            post_ids -= set(
+                self.filter(user=user, post_id__in=post_ids).values_list(
+                    "post_id", flat=True
+                )
+            )
+            self.bulk_create(
+                [self.model(post_id=post_id, user=user) for post_id in post_ids],
+                ignore_conflicts=True,
+            )
+            self.update_like_counts(post_ids)
+        caching.invalidate_posts(post_ids)
+        return post_ids
+
+    def unlike_many(self, user: User, post_ids) -> set:
+        """Remove the likes on ``post_ids``, returns the ids actually unliked."""
+        with transaction.atomic():
+            lock_posts(post_ids)
+            post_ids = set(
+                self.filter(user=user, post_id__in=post_ids).values_list(
+                    "post_id", flat=True
+                )
+            )
+            self.filter(user=user, post_id__in=post_ids).delete()
+            self.update_like_counts(post_ids)
+        caching.invalidate_posts(post_ids)
+        return post_ids
+
+    def update_like_counts(self, post_ids):
+        """
+        Set ``like_count`` of ``post_ids`` from their likes, rather than from
+        what the batch meant to write: a conflicting insert is skipped by
+        ``ignore_conflicts`` without a trace.
+        """
+        likes = (
+            self.filter(post=OuterRef("pk"))
+            .order_by()
+            .values("post")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        Post.all_objects.filter(pk__in=post_ids).update(
+            like_count=Coalesce(Subquery(likes), 0), updated_at=timezone.now()
+        )
+
+
+def lock_posts(post_ids, manager=None) -> set:
+    """Lock the rows of ``post_ids`` in id order, returns the ids found."""
+    manager = manager or Post.all_objects
+    return set(
+        manager.select_for_update()
+        .filter(pk__in=post_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+class Like(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = LikeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "user"], name="unique_post_like"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"], name="like_post_created_at_idx"
+            ),
+        ]
+
+
+class FollowManager(models.Manager):
+    def follow(self, follower: User, followee: User) -> bool:
+        try:
+            with transaction.atomic():
+                self.create(follower=follower, followee=followee)
+                User.all_objects.filter(pk=followee.pk).update(
+                    follower_count=F("follower_count") + 1
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def unfollow(self, follower: User, followee: User) -> bool:
+        with transaction.atomic():
+            deleted, _ = self.filter(follower=follower, followee=followee).delete()
+            if deleted:
+                User.all_objects.filter(pk=followee.pk).update(
+                    follower_count=F("follower_count") - 1
+                )
+        return bool(deleted)
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="following"
+    )
+    followee = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="followers"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = FollowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["follower", "followee"], name="unique_follow"
+            ),
+            models.CheckConstraint(
+                check=~Q(follower=F("followee")), name="follow_not_self"
+            ),
+        ]
+
+
+class ArchivedUser(models.Model):
+    """Users moved out of ``User`` by ``core.archive.purge``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    email = models.EmailField(db_index=True)
+    first_name = models.CharField(max_length=2048, null=True, blank=True)
+    last_name = models.CharField(max_length=2048, null=True, blank=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedPost(models.Model):
+    """Posts moved out of ``Post`` by ``core.archive.purge``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    author_id = models.BigIntegerField(db_index=True)
+    message = models.CharField(max_length=2048, null=True, blank=True)
+    slug = models.CharField(max_length=255, null=True, blank=True)
+    like_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
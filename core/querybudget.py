@@ -0,0 +1,192 @@
+"""
+Per-request query counting and N+1 detection.
+
+``QueryCounter`` is installed with ``connection.execute_wrapper`` and counts
+queries by SQL shape: the statement with its ``%s`` placeholders, ``IN``
+lists collapsed and savepoint names removed. The same shape repeated many
+times in one request is the signature of an N+1 query, typically a nested
+serializer reading a relation that was not ``select_related``.
+
+``QueryBudgetMiddleware`` applies it to every request when
+``QUERY_BUDGET_ENABLED`` (set with the environment variable of that name)
+and logs, or raises with ``QUERY_BUDGET_RAISE``, when a view runs more than
+its budget or repeats a shape more than ``QUERY_BUDGET_MAX_REPEATS`` times.
+Per endpoint totals are kept in ``core.metrics`` for the
+``query_budget_report`` command.
+
+``QueryBudgetTestMixin`` pins the same budgets in tests.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"\bIN \((?:%s, )*%s\)")
+SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+# Transaction control repeats legitimately, one savepoint per atomic block
+IGNORED_SHAPES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_shape(sql: str) -> str:
+    return SAVEPOINT.sub("?", IN_LIST.sub("IN (...)", sql))
+
+
+class QueryCounter:
+    def __init__(self):
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[query_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self) -> int:
+        return sum(self.shapes.values())
+
+    def repeated(self, max_repeats: int) -> dict:
+        """Shapes run more than ``max_repeats`` times, most repeated first."""
+        return {
+            shape: count
+            for shape, count in self.shapes.most_common()
+            if count > max_repeats and not shape.startswith(IGNORED_SHAPES)
+        }
+
+    def problems(self, budget: int, max_repeats: int) -> list:
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} queries, budget {budget}")
+        for shape, count in self.repeated(max_repeats).items():
+            problems.append(f"{count}x {shape[:200]}")
+        return problems
+
+
+def endpoint_name(request) -> str:
+    match = request.resolver_match
+    return f"{request.method}:{match.view_name if match else request.path}"
+
+
+def get_budget(endpoint: str) -> int:
+    return settings.QUERY_BUDGETS.get(endpoint, settings.QUERY_BUDGET_DEFAULT)
+
+
+def add_wrapper(counter: QueryCounter):
+    connection.execute_wrappers.append(counter)
+
+
+def remove_wrapper(counter: QueryCounter):
+    connection.execute_wrappers.remove(counter)
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries of sync and async views alike, without adapting either
+    to the other. Meant for development, it is not loaded unless
+    ``QUERY_BUDGET_ENABLED``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        return self.check(request, response, counter)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        # Connections are per thread: the wrapper goes on the connection of
+        # the thread the async ORM runs the request's queries in
+        await sync_to_async(add_wrapper)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_wrapper)(counter)
+        # Metrics are written to the cache, off the event loop
+        return await sync_to_async(self.check)(request, response, counter)
+
+    def check(self, request, response, counter: QueryCounter):
+        endpoint = endpoint_name(request)
+        budget = get_budget(endpoint)
+        repeated = counter.repeated(settings.QUERY_BUDGET_MAX_REPEATS)
+        metrics.incr(f"query-budget:{endpoint}:requests")
+        metrics.incr(f"query-budget:{endpoint}:queries", counter.count)
+        if counter.count > budget:
+            metrics.incr(f"query-budget:{endpoint}:over-budget")
+        if repeated:
+            metrics.incr(f"query-budget:{endpoint}:repeated")
+
+        problems = counter.problems(budget, settings.QUERY_BUDGET_MAX_REPEATS)
+        if problems:
+            message = f"{endpoint} {request.path}: " + "; ".join(problems)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        response["X-Query-Count"] = str(counter.count)
+        return response
+
+
+def get_report(endpoints) -> list:
+    """``(endpoint, requests, average queries, over budget, repeated)`` rows."""
+    names = [
+        f"query-budget:{endpoint}:{name}"
+        for endpoint in endpoints
+        for name in ("requests", "queries", "over-budget", "repeated")
+    ]
+    counters = metrics.get_counters(*names)
+    rows = []
+    for endpoint in endpoints:
+        requests = counters[f"query-budget:{endpoint}:requests"]
+        if not requests:
+            continue
+        rows.append(
+            (
+                endpoint,
+                requests,
+                counters[f"query-budget:{endpoint}:queries"] / requests,
+                counters[f"query-budget:{endpoint}:over-budget"],
+                counters[f"query-budget:{endpoint}:repeated"],
+            )
+        )
+    return rows
+
+
+class QueryBudgetTestMixin:
+    """``assertQueryBudget`` for test cases."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget: int = None, max_repeats: int = None):
+        """
+        Fail if the block runs more than ``budget`` queries or any SQL shape
+        more than ``max_repeats`` (``QUERY_BUDGET_MAX_REPEATS``) times.
+        """
+        if max_repeats is None:
+            max_repeats = settings.QUERY_BUDGET_MAX_REPEATS
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            yield counter
+        problems = counter.problems(budget, max_repeats)
+        if problems:
+            self.fail("Query budget exceeded:\n" + "\n".join(problems))
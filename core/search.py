@@ -0,0 +1,145 @@
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from core.models import Post
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class PostgresPostSearch:
+    """
+    Full-text search on ``Post.search_vector`` (GIN) combined with substring
+    matches on ``message`` served by the ``pg_trgm`` index, see migration
+    ``0005_post_search``.
+    """
+
+    config = "english"
+
+    def get_query(self, value: str) -> SearchQuery:
+        return SearchQuery(value, config=self.config, search_type="websearch")
+
+    def search(self, queryset, value: str):
+        query = self.get_query(value)
+        return queryset.filter(Q(search_vector=query) | Q(message__icontains=value))
+
+    def rank(self, queryset, value: str):
+        query = self.get_query(value)
+        return (
+            self.search(queryset, value)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-id")
+        )
+
+
+class InMemoryPostSearch:
+    """
+    In-process inverted index used when the database has no full-text support.
+
+    Terms and trigrams of every message are indexed in memory. Before each
+    search the index picks up rows whose ``updated_at`` moved since the last
+    sync, which also covers posts written with ``bulk_create``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.terms = defaultdict(set)
+        self.trigrams = defaultdict(set)
+        self.synced_at = None
+
+    def add(self, pk: int, message: str):
+        self.remove(pk)
+        document = (message or "").casefold()
+        self.documents[pk] = document
+        for term in tokenize(document):
+            self.terms[term].add(pk)
+        for trigram in trigrams(document):
+            self.trigrams[trigram].add(pk)
+
+    def remove(self, pk: int):
+        document = self.documents.pop(pk, None)
+        if document is None:
+            return
+        for term in tokenize(document):
+            self.terms[term].discard(pk)
+        for trigram in trigrams(document):
+            self.trigrams[trigram].discard(pk)
+
+    def sync(self):
+        with self.lock:
+            queryset = Post.all_objects.order_by("updated_at")
+            if self.synced_at is not None:
+                queryset = queryset.filter(updated_at__gte=self.synced_at)
+            rows = queryset.values_list("pk", "message", "updated_at")
+            for pk, message, updated_at in rows.iterator(chunk_size=2000):
+                self.add(pk, message)
+                if updated_at is not None:
+                    self.synced_at = updated_at
+
+    def match(self, value: str) -> dict:
+        needle = value.casefold()
+        if len(needle) >= 3:
+            candidates = set.intersection(
+                *(self.trigrams.get(trigram, set()) for trigram in trigrams(needle))
+            )
+        else:
+            candidates = set(self.documents)
+
+        scores = {}
+        for pk in candidates:
+            occurrences = self.documents[pk].count(needle)
+            if occurrences:
+                scores[pk] = float(occurrences)
+
+        terms = tokenize(needle)
+        if terms:
+            for pk in set.intersection(
+                *(self.terms.get(term, set()) for term in terms)
+            ):
+                scores[pk] = scores.get(pk, 0.0) + len(terms)
+        return scores
+
+    def search(self, queryset, value: str):
+        self.sync()
+        return queryset.filter(pk__in=list(self.match(value)))
+
+    def rank(self, queryset, value: str):
+        self.sync()
+        scores = self.match(value)
+        return (
+            queryset.filter(pk__in=list(scores))
+            .annotate(
+                search_rank=Case(
+                    *(When(pk=pk, then=Value(score)) for pk, score in scores.items()),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-search_rank", "-id")
+        )
+
+
+@lru_cache(maxsize=None)
+def get_post_search_backend():
+    backend = getattr(settings, "POST_SEARCH_BACKEND", None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == "postgresql":
+        return PostgresPostSearch()
+    return InMemoryPostSearch()
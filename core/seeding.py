@@ -0,0 +1,236 @@
+"""
+Synthetic users, meta data, posts and likes for benchmarks and load tests.
+
+Rows are written with ``bulk_create`` in chunks of ``batch_size``, each chunk
+in its own transaction and generated from its own random generator seeded
+with the seed, the table and the chunk number. The same arguments therefore
+produce the same emails, names, messages, slugs and likes whichever worker
+process writes which chunk and in whatever order. Slugs and emails are
+derived from the row number, so they are unique without looking anything up.
+
+Seeded users are recognised by their ``EMAIL_DOMAIN`` and all share
+``PASSWORD``, hashed once per run.
+"""
+import multiprocessing
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+
+from core.management.commands.benchmark_search import WORDS
+from core.models import Like, Post, User, UserMetaData
+from core.utils import slugify_message
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+EMAIL_DOMAIN = "seed.example.com"
+PASSWORD = "seed-password"
+POSTS_PER_USER = 10
+MAX_LIKES_PER_POST = 4
+# Rows per second expected of every worker, bulk_create spends most of it in
+# building model instances and SQL, about 6500 on a local Postgres
+TARGET_ROWS_PER_SECOND_PER_WORKER = 5000
+FIRST_NAMES = (
+    "Amina Brian Carla David Esther Faith George Hana Isaac Joan Kato Lydia "
+    "Moses Nora Oscar Peace Ruth Samuel Tendo Victor"
+).split()
+LAST_NAMES = (
+    "Achieng Byaruhanga Cruz Dubois Eriksen Fischer Garcia Hassan Ito Jensen "
+    "Kamau Lopez Mugisha Nakato Okello Patel Rossi Smith Tanaka Wanjiru"
+).split()
+COUNTRY_CODES = ("UG", "KE", "TZ", "RW", "NG", "ZA", "US", "GB", "DE", "IN")
+
+# Options of the running generation, set in every worker process
+worker = {}
+
+
+def seed_email(index: int) -> str:
+    return f"user-{index}@{EMAIL_DOMAIN}"
+
+
+def seed_slug(message: str, index: int) -> str:
+    # slugify lowercases, so no allocated slug ends with this suffix
+    return f"{slugify_message(message)}-S{index}"
+
+
+def chunk_random(seed: int, table: str, chunk: int) -> random.Random:
+    return random.Random(f"{seed}:{table}:{chunk}")
+
+
+def get_seeded_users():
+    return User.all_objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+
+
+def get_dataset() -> dict:
+    users = get_seeded_users()
+    return {
+        "users": users.count(),
+        "meta_data": UserMetaData.objects.filter(user__in=users).count(),
+        "posts": Post.all_objects.filter(author__in=users).count(),
+        "likes": Like.objects.filter(user__in=users).count(),
+    }
+
+
+def clear():
+    get_seeded_users().delete()
+
+
+def create_users(task) -> int:
+    chunk, start, stop = task
+    rng = chunk_random(worker["seed"], "users", chunk)
+    rows = [
+        (
+            index,
+            rng.choice(FIRST_NAMES),
+            rng.choice(LAST_NAMES),
+            ".".join(str(rng.randint(1, 254)) for _ in range(4)),
+            rng.choice(COUNTRY_CODES),
+        )
+        for index in range(start, stop)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(
+                email=seed_email(index),
+                password=worker["password"],
+                first_name=first_name,
+                last_name=last_name,
+                # Without meta data an address would make the user pending
+                # for enrich_pending_users and its paid lookups
+                signup_ip_address=ip_address if worker["meta_data"] else None,
+            )
+            for index, first_name, last_name, ip_address, _ in rows
+        )
+        meta_data = []
+        if worker["meta_data"]:
+            meta_data = UserMetaData.objects.bulk_create(
+                UserMetaData(
+                    user_id=user.pk,
+                    geo_data={"ip_address": ip_address, "country_code": country_code},
+                    public_holidays=[],
+                )
+                for user, (_, _, _, ip_address, country_code) in zip(users, rows)
+            )
+    return len(users) + len(meta_data)
+
+
+def create_posts(task) -> int:
+    chunk, start, stop = task
+    rng = chunk_random(worker["seed"], "posts", chunk)
+    user_ids = worker["user_ids"]
+    rows = []
+    for index in range(start, stop):
+        message = " ".join(rng.choices(WORDS, k=rng.randint(3, 12)))
+        likers = rng.sample(
+            user_ids, min(len(user_ids), rng.randint(0, worker["max_likes"]))
+        )
+        rows.append((index, rng.choice(user_ids), message, likers))
+
+    with transaction.atomic():
+        posts = Post.objects.bulk_create(
+            Post(
+                author_id=author_id,
+                message=message,
+                slug=seed_slug(message, index),
+                like_count=len(likers),
+            )
+            for index, author_id, message, likers in rows
+        )
+        likes = Like.objects.bulk_create(
+            Like(post_id=post.pk, user_id=user_id)
+            for post, (_, _, _, likers) in zip(posts, rows)
+            for user_id in likers
+        )
+    return len(posts) + len(likes)
+
+
+def init_worker(options: dict):
+    worker.clear()
+    worker.update(options)
+
+
+def get_tasks(count: int, batch_size: int) -> list:
+    return [
+        (chunk, start, min(start + batch_size, count))
+        for chunk, start in enumerate(range(0, count, batch_size))
+    ]
+
+
+def run_tasks(function, tasks: list, workers: int, options: dict, progress):
+    """Run ``function`` over ``tasks`` in ``workers`` processes, in order if 1."""
+    if workers == 1:
+        init_worker(options)
+        for rows in map(function, tasks):
+            progress(function.__name__, rows)
+        return
+
+    # Forked workers must open their own connections, not share the parent's
+    connections.close_all()
+    with multiprocessing.get_context("fork").Pool(
+        workers, initializer=init_worker, initargs=(options,)
+    ) as pool:
+        for rows in pool.imap_unordered(function, tasks):
+            progress(function.__name__, rows)
+
+
+def get_workers(workers: int) -> int:
+    # SQLite takes one writer at a time, and a test database may be in memory
+    return 1 if connection.vendor == "sqlite" else max(1, workers)
+
+
+def generate(
+    users: int,
+    posts: int,
+    max_likes: int = MAX_LIKES_PER_POST,
+    meta_data: bool = True,
+    seed: int = 42,
+    batch_size: int = 5000,
+    workers: int = 1,
+    progress=None,
+) -> float:
+    """
+    Create ``users`` users, with meta data unless ``meta_data`` is False,
+    then ``posts`` posts with up to ``max_likes`` likes each. ``progress``
+    is called with the task name and the rows of every finished chunk.
+    Returns the seconds taken.
+    """
+    progress = progress or (lambda name, rows: None)
+    workers = get_workers(workers)
+    started = time.perf_counter()
+    options = {
+        "seed": seed,
+        "password": make_password(PASSWORD),
+        "meta_data": meta_data,
+        "max_likes": max_likes,
+    }
+    run_tasks(create_users, get_tasks(users, batch_size), workers, options, progress)
+
+    # Ordered by email, row number i is the same user in every run
+    options["user_ids"] = list(
+        get_seeded_users().order_by("email").values_list("pk", flat=True)
+    )
+    if posts and not options["user_ids"]:
+        raise ValueError("Posts need at least one seeded user")
+    run_tasks(create_posts, get_tasks(posts, batch_size), workers, options, progress)
+    return time.perf_counter() - started
+
+
+def seed(posts: int, seed: int = 42, batch_size: int = 5000) -> dict:
+    """
+    Create a benchmark dataset of ``posts`` posts, one user per
+    ``POSTS_PER_USER`` posts and up to ``MAX_LIKES_PER_POST`` likes per post.
+    An existing dataset of the same size is reused, one of another size is
+    replaced.
+    """
+    dataset = get_dataset()
+    if dataset["posts"] == posts:
+        return dataset
+    clear()
+    generate(
+        max(1, posts // POSTS_PER_USER),
+        posts,
+        meta_data=False,
+        seed=seed,
+        batch_size=batch_size,
+    )
+    return get_dataset()
@@ -1,17 +1,122 @@
-from core.models import User, UserMetaData
-from core.utils import AbstractAPI
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import archive, caching, enrichment, images
+from core.models import Follow, Post, User
+from core.timeline import get_timeline_store
 from social_network_backend.celery import app
 
+FAN_OUT_BATCH_SIZE = 1000
+BACKFILL_SIZE = 50
+ENRICHMENT_SCHEDULED_KEY = "enrichment:scheduled"
+
+
+def schedule_enrichment():
+    """
+    Queue one delayed enrich_pending_users run for every signup until it
+    starts, so a signup spike is enriched by a few batched tasks.
+    """
+    delay = settings.ENRICHMENT_DELAY
+    if cache.add(ENRICHMENT_SCHEDULED_KEY, True, timeout=delay + 60):
+        enrich_pending_users.apply_async(countdown=delay)
+
+
+@app.task
+def enrich_pending_users(batch_size: int = None) -> int:
+    """Fill in UserMetaData for every user whose enrichment is due, batch by batch."""
+    cache.delete(ENRICHMENT_SCHEDULED_KEY)
+    batch_size = batch_size or settings.ENRICHMENT_BATCH_SIZE
+    pending = (
+        User.objects.filter(enrichment_retry_at__lte=timezone.now())
+        .order_by("pk")
+        .only("pk", "signup_ip_address", "created_at", "enrichment_attempts")
+    )
+
+    enriched = 0
+    last_pk = 0
+    while True:
+        users = list(pending.filter(pk__gt=last_pk)[:batch_size])
+        if not users:
+            return enriched
+        batch_enriched = enrichment.enrich_users(users)
+        enriched += batch_enriched
+        # Short batch: done. Rejected users are left for the next sweep, and
+        # while the breaker is open so would be every following batch.
+        if len(users) < batch_size or enrichment.is_upstream_open():
+            return enriched
+        last_pk = users[-1].pk
+
 
 @app.task
 def save_user_meta_data(ip_address: str, username: str):
+    """Single user enrichment, kept for already queued messages."""
     user = User.objects.get_by_natural_key(username)
-    geo_data = AbstractAPI.get_geo_data(ip_address)
-    meta_data = UserMetaData(user=user, geo_data=geo_data)
-    meta_data.save()
+    if ip_address and not user.signup_ip_address:
+        user.signup_ip_address = ip_address
+        User.objects.filter(pk=user.pk).update(signup_ip_address=ip_address)
+    enrichment.enrich_users([user])
 
-    public_holidays = AbstractAPI.get_public_holidays(
-        country_code=geo_data.get("country_code", ""), date=user.created_at
+
+@app.task
+def process_profile_picture(user_id: int, name: str):
+    variants = images.create_variants(name)
+    # A newer upload wins over a slow task for an older one
+    updated = User.objects.filter(pk=user_id, profile_picture=name).update(
+        profile_picture_variants=variants, updated_at=timezone.now()
     )
-    meta_data.public_holidays = public_holidays
-    meta_data.save()
+    if updated:
+        caching.invalidate_author(user_id)
+
+
+@app.task
+def purge_soft_deleted() -> dict:
+    return archive.purge()
+
+
+@app.task
+def fan_out_post(post_id: int):
+    post = (
+        Post.objects.filter(pk=post_id)
+        .values("author_id", "author__follower_count")
+        .first()
+    )
+    # Followers of very popular authors pull their posts at read time instead
+    if post is None or post["author__follower_count"] > settings.TIMELINE_FANOUT_LIMIT:
+        return
+
+    store = get_timeline_store()
+    follower_ids = (
+        Follow.objects.filter(followee_id=post["author_id"])
+        .values_list("follower_id", flat=True)
+        .iterator(chunk_size=FAN_OUT_BATCH_SIZE)
+    )
+    batch = []
+    for follower_id in follower_ids:
+        batch.append(follower_id)
+        if len(batch) >= FAN_OUT_BATCH_SIZE:
+            store.push(batch, post_id)
+            batch = []
+    if batch:
+        store.push(batch, post_id)
+
+
+@app.task
+def backfill_timeline(follower_id: int, followee_id: int):
+    post_ids = (
+        Post.objects.filter(author_id=followee_id)
+        .order_by("-created_at", "-id")[:BACKFILL_SIZE]
+        .values_list("id", flat=True)
+    )
+    store = get_timeline_store()
+    for post_id in reversed(post_ids):
+        store.push([follower_id], post_id)
+
+
+@app.task
+def remove_from_timeline(follower_id: int, followee_id: int):
+    store = get_timeline_store()
+    post_ids = Post.objects.filter(
+        pk__in=store.get(follower_id), author_id=followee_id
+    ).values_list("id", flat=True)
+    store.remove(follower_id, list(post_ids))
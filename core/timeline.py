@@ -0,0 +1,89 @@
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+
+class InMemoryTimelineStore:
+    """
+    Process-local timelines, used when no Redis is configured (tests, local
+    development). Every list is capped at ``max_length`` post ids.
+    """
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self.lock = threading.Lock()
+        self.timelines = defaultdict(lambda: deque(maxlen=self.max_length))
+
+    def push(self, user_ids, post_id: int):
+        with self.lock:
+            for user_id in user_ids:
+                self.timelines[user_id].appendleft(post_id)
+
+    def remove(self, user_id: int, post_ids):
+        post_ids = set(post_ids)
+        with self.lock:
+            timeline = self.timelines.get(user_id)
+            if timeline is None:
+                return
+            self.timelines[user_id] = deque(
+                (pk for pk in timeline if pk not in post_ids), maxlen=self.max_length
+            )
+
+    def get(self, user_id: int) -> list:
+        with self.lock:
+            return list(self.timelines.get(user_id, ()))
+
+    def clear(self):
+        with self.lock:
+            self.timelines.clear()
+
+
+class RedisTimelineStore:
+    """Timelines kept as capped Redis lists, shared by web and Celery workers."""
+
+    key_prefix = "timeline"
+
+    def __init__(self, url: str, max_length: int):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_length = max_length
+
+    def key(self, user_id: int) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    def push(self, user_ids, post_id: int):
+        pipeline = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            key = self.key(user_id)
+            pipeline.lpush(key, post_id)
+            pipeline.ltrim(key, 0, self.max_length - 1)
+        pipeline.execute()
+
+    def remove(self, user_id: int, post_ids):
+        pipeline = self.client.pipeline(transaction=False)
+        for post_id in post_ids:
+            pipeline.lrem(self.key(user_id), 0, post_id)
+        pipeline.execute()
+
+    def get(self, user_id: int) -> list:
+        return [int(pk) for pk in self.client.lrange(self.key(user_id), 0, -1)]
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.key_prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+_stores = {}
+
+
+def get_timeline_store():
+    url = settings.TIMELINE_REDIS_URL
+    if url not in _stores:
+        if url:
+            _stores[url] = RedisTimelineStore(url, settings.TIMELINE_MAX_LENGTH)
+        else:
+            _stores[url] = InMemoryTimelineStore(settings.TIMELINE_MAX_LENGTH)
+    return _stores[url]
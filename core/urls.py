@@ -5,7 +5,11 @@ from django.urls import path
 from rest_framework.routers import SimpleRouter
 
 from core.api.auth.views import AuthViewSet
+from core.api.export.views import ExportViewSet
+from core.api.feed.views import FeedViewSet
+from core.api.posts.async_views import post_detail, post_list
 from core.api.posts.views import PostViewSet
+from core.api.user.async_views import user_me
 from core.api.user.views import UserViewSet
 
 router = SimpleRouter(trailing_slash=False)
@@ -13,9 +17,15 @@ router = SimpleRouter(trailing_slash=False)
 router.register(r"users", UserViewSet, basename="user")
 router.register(r"auth", AuthViewSet, basename="auth")
 router.register(r"posts", PostViewSet, basename="post")
+router.register(r"feed", FeedViewSet, basename="feed")
+router.register(r"export", ExportViewSet, basename="export")
 
 urlpatterns = [
     path(r"api/", include(router.urls)),
+    # Async read path, served without a worker thread under ASGI
+    path("api/async/posts", post_list, name="async-post-list"),
+    path("api/async/posts/<int:pk>", post_detail, name="async-post-detail"),
+    path("api/async/users/me", user_me, name="async-user-me"),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
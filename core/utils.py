@@ -1,16 +1,23 @@
+import os
 import string
 import random
+import threading
 from datetime import datetime
 
+import httpx
 import jwt
 import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
 from jwt import InvalidSignatureError, DecodeError
 from requests.adapters import HTTPAdapter
 from rest_framework_simplejwt.tokens import RefreshToken
 from urllib3 import Retry
 
-from core.models import User
-from social_network_backend.settings import SECRET_KEY, ABSTRACT_API_KEY
+from core.circuitbreaker import CircuitBreaker
+from core.models import Post, User
+from social_network_backend.settings import SECRET_KEY
 
 
 def get_refresh_and_access_tokens(user: User):
@@ -37,59 +44,253 @@ def n_length_alphanumeric(length, upper=True):
     return value
 
 
-def generate_post_slug(post, tries=0):
-    slug = post.message.strip().replace(" ", "-").lower()
-    if tries == 0:
-        post.slug = slug
-    elif tries > 4:
-        post.slug = f"{post.pk}-{slug}-{n_length_alphanumeric(5, False)}"
-    else:
-        post.slug = f"{slug}-{n_length_alphanumeric(5, False)}"
+SLUG_MAX_LENGTH = Post._meta.get_field("slug").max_length
+SLUG_SUFFIX_LENGTH = 5
+SLUG_INSERT_ATTEMPTS = 3
 
-    try:
-        post.save(update_fields=["slug"])
-    except Exception:
-        if tries < 5:
-            generate_post_slug(post, tries + 1)
+
+def slugify_message(message: str) -> str:
+    # Leaves room for the "-" and suffix added on collisions
+    length = SLUG_MAX_LENGTH - SLUG_SUFFIX_LENGTH - 1
+    slug = slugify(message or "", allow_unicode=True)[:length].strip("-")
+    return slug or "post"
+
+
+def allocate_post_slugs(messages) -> list:
+    """
+    Unique slugs for a batch of new posts. Every post gets its base slug and
+    suffixed fallbacks, all checked against the unique slug index in a single
+    query, so a collision costs no extra round-trip in practice.
+    """
+    bases = [slugify_message(message) for message in messages]
+    slugs = [None] * len(bases)
+    seen = set()
+    pending = list(range(len(bases)))
+    first_round = True
+    while pending:
+        candidates = {
+            i: ([bases[i]] if first_round else [])
+            + [
+                f"{bases[i]}-{n_length_alphanumeric(SLUG_SUFFIX_LENGTH, False)}"
+                for _ in range(2)
+            ]
+            for i in pending
+        }
+        # Soft deleted posts keep their slugs
+        taken = seen | set(
+            Post.all_objects.filter(
+                slug__in={slug for values in candidates.values() for slug in values}
+            ).values_list("slug", flat=True)
+        )
+
+        retry = []
+        for i in pending:
+            slugs[i] = next((slug for slug in candidates[i] if slug not in taken), None)
+            if slugs[i] is None:
+                retry.append(i)
+            else:
+                taken.add(slugs[i])
+                seen.add(slugs[i])
+        pending = retry
+        first_round = False
+    return slugs
+
+
+def create_post(**fields) -> Post:
+    """
+    Inserts a post with its slug in the same INSERT. The insert is only
+    repeated when a concurrent request took the slug in between.
+    """
+    for attempt in range(SLUG_INSERT_ATTEMPTS):
+        post = Post(slug=allocate_post_slugs([fields.get("message")])[0], **fields)
+        try:
+            with transaction.atomic():
+                post.save(force_insert=True)
+        except IntegrityError:
+            if attempt == SLUG_INSERT_ATTEMPTS - 1:
+                raise
+            continue
+        return post
 
 
 class AbstractAPI:
+    """
+    Client for the AbstractAPI geolocation and holidays endpoints.
+
+    All calls share one pooled ``requests.Session`` per process, so
+    connections are kept alive between lookups instead of paying a TCP and
+    TLS handshake each time. Failed lookups return None, so they are not
+    mistaken for an empty result, while the upstream is unhealthy they raise
+    ``CircuitOpenError`` instead.
+    """
+
+    # One immediate retry for a transient 5xx. Read timeouts are not retried
+    # and persistent failures are left to the circuit breaker, so workers do
+    # not sleep through backoffs for an upstream that is down.
     retry_strategy = Retry(
-        total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]
+        total=1, read=0, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]
     )
+    breaker = CircuitBreaker(
+        "abstract-api",
+        failure_threshold=settings.ABSTRACT_API_FAILURE_THRESHOLD,
+        failure_window=settings.ABSTRACT_API_FAILURE_WINDOW,
+        reset_timeout=settings.ABSTRACT_API_RESET_TIMEOUT,
+        latency_target=settings.ABSTRACT_API_LATENCY_TARGET,
+        max_concurrency=settings.ABSTRACT_API_MAX_CONCURRENCY,
+    )
+    session = None
+    session_pid = None
+    session_lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        # Created lazily and per process, a forked Celery worker never
+        # shares sockets with its parent
+        with cls.session_lock:
+            if cls.session is None or cls.session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    max_retries=cls.retry_strategy,
+                    pool_maxsize=settings.ABSTRACT_API_POOL_SIZE,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls.session, cls.session_pid = session, os.getpid()
+            return cls.session
 
-    @staticmethod
-    def get_geo_data(ip_address: str) -> dict:
-        session = requests.Session()
-        session.mount("https://", HTTPAdapter(max_retries=AbstractAPI.retry_strategy))
+    @classmethod
+    def close(cls):
+        with cls.session_lock:
+            if cls.session is not None:
+                cls.session.close()
+            cls.session = None
+
+    @classmethod
+    def get_json(cls, url: str, params: dict, default):
         try:
-            response = session.get(
-                url="https://ipgeolocation.abstractapi.com/v1",
-                params={"api_key": ABSTRACT_API_KEY, "ip_address": ip_address},
-            )
+            with cls.breaker.call():
+                response = cls.get_session().get(
+                    url=url,
+                    params={"api_key": settings.ABSTRACT_API_KEY, **params},
+                    timeout=settings.ABSTRACT_API_TIMEOUT,
+                )
+                if response.status_code >= 500 or response.status_code == 429:
+                    raise requests.HTTPError(
+                        f"{response.status_code} from {url}", response=response
+                    )
             if response.status_code == 200:
                 return response.json()
-        except Exception as ex:
+        except (requests.RequestException, ValueError) as ex:
             print(ex)
-        return {}
+        return default
+
+    @classmethod
+    def get_geo_data(cls, ip_address: str) -> dict:
+        return cls.get_json(
+            settings.ABSTRACT_API_GEO_URL, {"ip_address": ip_address}, default=None
+        )
 
-    @staticmethod
-    def get_public_holidays(country_code: str, date: datetime) -> list:
-        session = requests.Session()
-        session.mount("https://", HTTPAdapter(max_retries=AbstractAPI.retry_strategy))
+    @classmethod
+    def get_public_holidays(cls, country_code: str, date: datetime) -> list:
+        return cls.get_json(
+            settings.ABSTRACT_API_HOLIDAYS_URL,
+            holiday_params(country_code, date),
+            default=None,
+        )
+
+    @classmethod
+    def get_holiday_calendar(cls, country_code: str, year: int) -> list:
+        """Every public holiday of ``country_code`` in ``year``."""
+        return cls.get_json(
+            settings.ABSTRACT_API_HOLIDAYS_URL,
+            {"country": country_code, "year": year},
+            default=None,
+        )
+
+
+def holiday_params(country_code: str, date: datetime) -> dict:
+    return {
+        "country": country_code,
+        "year": date.year,
+        "month": date.month,
+        "day": date.day,
+    }
+
+
+class AsyncAbstractAPI:
+    """
+    asyncio variant of ``AbstractAPI`` for running many lookups concurrently.
+
+    Calls share the circuit breaker and concurrency limit of ``AbstractAPI``
+    and its retry policy. The pooled ``httpx.AsyncClient`` is bound to the
+    running event loop, so the client is used as an async context manager
+    around a batch::
+
+        async with AsyncAbstractAPI() as api:
+            geo_data = await asyncio.gather(*map(api.get_geo_data, ips))
+    """
+
+    # Like AbstractAPI.retry_strategy, one immediate retry of a failed
+    # connection or a transient 5xx, read timeouts are not retried
+    retries = 1
+    retry_statuses = {500, 502, 503, 504}
+    breaker = AbstractAPI.breaker
+
+    async def __aenter__(self):
+        connect, read = settings.ABSTRACT_API_TIMEOUT
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=settings.ABSTRACT_API_POOL_SIZE),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def get_json(self, url: str, params: dict, default):
+        params = {"api_key": settings.ABSTRACT_API_KEY, **params}
         try:
-            response = session.get(
-                url="https://holidays.abstractapi.com/v1",
-                params={
-                    "api_key": ABSTRACT_API_KEY,
-                    "country": country_code,
-                    "year": date.year,
-                    "month": date.month,
-                    "day": date.day,
-                },
-            )
+            with self.breaker.call():
+                response = await self.get(url, params)
+                if response.status_code >= 500 or response.status_code == 429:
+                    raise httpx.HTTPStatusError(
+                        f"{response.status_code} from {url}",
+                        request=response.request,
+                        response=response,
+                    )
             if response.status_code == 200:
                 return response.json()
-        except Exception as ex:
+        except (httpx.HTTPError, ValueError) as ex:
             print(ex)
-        return []
+        return default
+
+    async def get(self, url: str, params: dict) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            retry = attempt < self.retries
+            try:
+                response = await self.client.get(url, params=params)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if retry:
+                    continue
+                raise
+            if not retry or response.status_code not in self.retry_statuses:
+                return response
+
+    async def get_geo_data(self, ip_address: str) -> dict:
+        return await self.get_json(
+            settings.ABSTRACT_API_GEO_URL, {"ip_address": ip_address}, default=None
+        )
+
+    async def get_public_holidays(self, country_code: str, date: datetime) -> list:
+        return await self.get_json(
+            settings.ABSTRACT_API_HOLIDAYS_URL,
+            holiday_params(country_code, date),
+            default=None,
+        )
+
+    async def get_holiday_calendar(self, country_code: str, year: int) -> list:
+        return await self.get_json(
+            settings.ABSTRACT_API_HOLIDAYS_URL,
+            {"country": country_code, "year": year},
+            default=None,
+        )
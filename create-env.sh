@@ -14,6 +14,8 @@ POSTGRES_PASSWORD=admin
 RDS_PORT=5432
 ABSTRACT_API_KEY=$ABSTRACT_API_KEY
 CELERY_BROKER_URL=redis://redis
+TIMELINE_REDIS_URL=redis://redis/1
+REDIS_CACHE_URL=redis://redis/2
 "
 ENV_FILE=".env"
 
@@ -1,4 +1,4 @@
 #!/bin/bash
 
 export DOCKER_BUILDKIT=1
-docker compose up --build web
\ No newline at end of file
+docker compose up --build web web_async
\ No newline at end of file
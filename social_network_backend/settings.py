@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.querybudget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -56,6 +57,19 @@ MIDDLEWARE = [
     "core.authentication.AuthTokenRefreshMiddleware",
 ]
 
+# Per-request query counting and N+1 detection, see core/querybudget.py. Off
+# unless asked for, it costs every request a few cache writes
+QUERY_BUDGET_ENABLED = os.environ.get("QUERY_BUDGET_ENABLED") == "1"
+# Raise instead of logging a warning when a request is over budget
+QUERY_BUDGET_RAISE = False
+QUERY_BUDGET_DEFAULT = 10
+# "METHOD:url-name" budgets overriding QUERY_BUDGET_DEFAULT
+QUERY_BUDGETS = {
+    "POST:post-batch-like": 15,
+}
+# The same SQL shape run more often than this in one request is an N+1
+QUERY_BUDGET_MAX_REPEATS = 3
+
 ROOT_URLCONF = "social_network_backend.urls"
 
 TEMPLATES = [
@@ -94,6 +108,32 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if os.environ.get("REDIS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get("REDIS_CACHE_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10_000},
+        }
+    }
+
+# 0 turns the post and post list caches off
+POST_CACHE_TIMEOUT = int(os.environ.get("POST_CACHE_TIMEOUT", 300))
+USER_SNAPSHOT_TIMEOUT = 300
+
+# Maximum number of post ids accepted by POST /api/posts/batch-like
+POST_BATCH_LIKE_LIMIT = 100
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -114,7 +154,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -151,10 +191,71 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded profile pictures and their variants, see core/images.py
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+PROFILE_PICTURE_MAX_SIZE = 10 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 ABSTRACT_API_KEY = os.environ.get("ABSTRACT_API_KEY")
+ABSTRACT_API_GEO_URL = "https://ipgeolocation.abstractapi.com/v1"
+ABSTRACT_API_HOLIDAYS_URL = "https://holidays.abstractapi.com/v1"
+# (connect, read) timeouts in seconds, a stalled upstream never hangs a worker
+ABSTRACT_API_TIMEOUT = (3.05, 10)
+# Keep-alive connections kept per host by the pooled AbstractAPI clients
+ABSTRACT_API_POOL_SIZE = 10
+# Shared circuit breaker, see core/circuitbreaker.py. That many failures
+# within the window stop all calls for ABSTRACT_API_RESET_TIMEOUT seconds.
+ABSTRACT_API_FAILURE_THRESHOLD = 5
+ABSTRACT_API_FAILURE_WINDOW = 60
+ABSTRACT_API_RESET_TIMEOUT = 30
+# Calls in flight across all processes shrink while calls take longer than this
+ABSTRACT_API_LATENCY_TARGET = 1.0
+ABSTRACT_API_MAX_CONCURRENCY = 20
+
+# Geolocation and holiday lookups, see core/enrichment.py
+# "abstractapi" or "local", the offline index built by build_geoip_index
+GEO_PROVIDER = os.environ.get("GEO_PROVIDER", "abstractapi")
+GEOIP_INDEX_PATH = os.environ.get("GEOIP_INDEX_PATH", str(BASE_DIR / "geoip.idx"))
+GEO_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+# Share geolocation results across a /24 (IPv4) or /64 (IPv6) network
+GEO_CACHE_BY_PREFIX = False
+HOLIDAY_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+ENRICHMENT_LOCAL_CACHE_SIZE = 4096
+ENRICHMENT_LOCAL_CACHE_TTL = 60 * 60
+# Signups within ENRICHMENT_DELAY seconds are enriched by one batched task
+ENRICHMENT_DELAY = 5
+ENRICHMENT_BATCH_SIZE = 500
+# Users whose lookups fail are retried after ENRICHMENT_RETRY_BACKOFF seconds,
+# doubled after every attempt, and left without meta data after the last one
+ENRICHMENT_MAX_ATTEMPTS = 5
+ENRICHMENT_RETRY_BACKOFF = 5 * 60
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for signups whose scheduled enrichment run was lost
+    "enrich-pending-users": {
+        "task": "core.tasks.enrich_pending_users",
+        "schedule": 60.0,
+    },
+    "purge-soft-deleted": {
+        "task": "core.tasks.purge_soft_deleted",
+        "schedule": 60.0 * 60,
+    },
+}
+# Soft deleted posts and users are moved to the archive tables after this
+# many days, in batches of PURGE_BATCH_SIZE rows with a pause in between
+SOFT_DELETE_RETENTION_DAYS = 30
+PURGE_BATCH_SIZE = 200
+PURGE_BATCH_PAUSE = 0.5
+PURGE_MAX_BATCHES = 100
+
+# Home timelines, see core/timeline.py. Without a Redis URL timelines are kept
+# in process memory, which is only suitable for tests and local development.
+TIMELINE_REDIS_URL = os.environ.get("TIMELINE_REDIS_URL")
+TIMELINE_MAX_LENGTH = 800
+# Authors with more followers than this are merged into feeds at read time
+TIMELINE_FANOUT_LIMIT = 10_000